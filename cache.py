@@ -1,16 +1,22 @@
 """
 缓存系统模块，支持内存缓存和持久化存储
 """
-import json
+import asyncio
+import atexit
 import logging
 import os
+import queue
 import sqlite3
+import struct
+import threading
 import time
-from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterable, Optional, Protocol
 from collections import OrderedDict
 
+import msgspec
+import orjson
+
 # ------------- logger -------------
 def setup_logger(name: str = "summarizer") -> logging.Logger:
     """返回已配置好的 logger 实例（带控制台 handler）"""
@@ -27,6 +33,179 @@ def setup_logger(name: str = "summarizer") -> logging.Logger:
 
 logger = setup_logger(__name__)
 
+# ------------- SQLite 调优参数 -------------
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # 256 MiB 内存映射
+SQLITE_CACHE_SIZE = -65536  # 负数单位为 KiB，即 64 MiB 页缓存
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# 只读连接池大小（WAL 模式下读不阻塞写，写也不阻塞读）
+READER_POOL_SIZE = 4
+
+# 每隔多少次 get 才检查一次是否到了清理时间
+CLEANUP_CHECK_OPS = 1024
+
+# get_many 单条 IN 查询最多携带的 key 数
+GET_MANY_CHUNK = 500
+
+# set_async 的写回队列收到第一条数据后再等待这么久（秒），把同一时段的写入合并为一个事务
+WRITE_BACK_DELAY = 0.05
+
+# ------------- 值的编码格式 -------------
+# BLOB 首字节为格式标记；控制字符不会出现在合法 JSON 的开头，
+# 因此没有标记的旧数据（整段 orjson）仍可按原方式读取
+_TAG_STR = b"\x01"  # 原始 UTF-8 字符串（摘要等最常见的值，跳过序列化）
+_TAG_JSON = b"\x02"  # orjson
+_TAG_MSGPACK = b"\x03"  # msgpack，兜底 JSON 无法表示的值（如 bytes）
+
+
+def _encode(value: Any) -> bytes:
+    """将缓存值编码为带格式标记的 BLOB"""
+    if type(value) is str:
+        return _TAG_STR + value.encode()
+    try:
+        return _TAG_JSON + orjson.dumps(value)
+    except TypeError:
+        return _TAG_MSGPACK + msgspec.msgpack.encode(value)
+
+
+def _decode(raw: bytes) -> Any:
+    """解码 _encode 生成的 BLOB，兼容没有格式标记的旧数据"""
+    tag = raw[:1]
+    if tag == _TAG_STR:
+        return raw[1:].decode()
+    if tag == _TAG_JSON:
+        return orjson.loads(raw[1:])
+    if tag == _TAG_MSGPACK:
+        return msgspec.msgpack.decode(raw[1:])
+    return orjson.loads(raw)
+
+
+# ------------- 缓存文件位置 -------------
+# 其余缓存库（摘要、分类、语义缓存）与 CACHE_DB_PATH 放在同一目录下
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", ".cache/cache.db")
+CACHE_DIR = Path(CACHE_DB_PATH).parent
+
+
+def cache_path(filename: str) -> str:
+    """返回缓存目录下指定文件的路径"""
+    return str(CACHE_DIR / filename)
+
+
+# ------------- 共享缓存层 -------------
+REDIS_URL = os.getenv("REDIS_URL", "")
+_EXPIRE_HEADER = struct.Struct("<d")  # 远端值前缀：过期时间戳（float64）
+# Redis 在事件循环线程中同步访问，超时必须很短；出错后暂停访问一段时间，避免每次调用都卡满超时
+REDIS_SOCKET_TIMEOUT = 0.5
+REDIS_RETRY_INTERVAL = 30
+
+
+class CacheTier(Protocol):
+    """位于内存与 SQLite 之间的共享缓存层，值附带绝对过期时间"""
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[Any, float]]:
+        """返回命中的 key -> (value, expire_time)"""
+        ...
+
+    def set_many(self, items: list[tuple[str, Any, float]]) -> None:
+        """写入 (key, value, expire_time) 序列"""
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class RedisTier:
+    """
+    基于 Redis 的共享缓存层，多个进程 / 机器上的实例共享命中
+
+    key 带有 namespace 前缀；值为 8 字节过期时间 + _encode 的 BLOB（字符串仍为原始 UTF-8），
+    同时设置 Redis TTL，过期数据由 Redis 自行淘汰。连接失败时视为未命中，不影响本地缓存
+    """
+
+    def __init__(self, url: str, namespace: str):
+        # 可选依赖，只有配置了 REDIS_URL 才需要安装
+        import redis
+
+        self._client = redis.Redis.from_url(  # 内部维护连接池
+            url,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+        self._prefix = f"llm-issue:{namespace}:"
+        self._errors = (redis.RedisError,)
+        self._retry_at = 0.0  # 在此时间（monotonic）之前跳过 Redis
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _failed(self, action: str, error: Exception) -> None:
+        """记录失败并在 REDIS_RETRY_INTERVAL 秒内跳过 Redis"""
+        logger.warning("Redis %s failed, skipping Redis for %ds: %s", action, REDIS_RETRY_INTERVAL, error)
+        self._retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[Any, float]]:
+        if not keys or not self._available():
+            return {}
+        try:
+            raws = self._client.mget([self._prefix + key for key in keys])
+        except self._errors as e:
+            self._failed("get", e)
+            return {}
+        now = time.time()
+        found: dict[str, tuple[Any, float]] = {}
+        for key, raw in zip(keys, raws):
+            if raw is None:
+                continue
+            try:
+                (expire_time,) = _EXPIRE_HEADER.unpack_from(raw)
+                if expire_time > now:
+                    found[key] = (_decode(raw[_EXPIRE_HEADER.size:]), expire_time)
+            except (struct.error, ValueError, msgspec.DecodeError):
+                # 同一前缀下被其他程序写入或已损坏的值，按未命中处理
+                logger.warning("Ignoring malformed Redis value for %s", key)
+        return found
+
+    def set_many(self, items: list[tuple[str, Any, float]]) -> None:
+        if not items or not self._available():
+            return
+        now = time.time()
+        pipe = self._client.pipeline(transaction=False)
+        for key, value, expire_time in items:
+            ttl_ms = int((expire_time - now) * 1000)
+            if ttl_ms > 0:
+                pipe.set(
+                    self._prefix + key,
+                    _EXPIRE_HEADER.pack(expire_time) + _encode(value),
+                    px=ttl_ms,
+                )
+        try:
+            pipe.execute()
+        except self._errors as e:
+            self._failed("set", e)
+
+    def delete(self, key: str) -> None:
+        try:
+            self._client.delete(self._prefix + key)
+        except self._errors as e:
+            self._failed("delete", e)
+
+    def clear(self) -> None:
+        try:
+            keys = list(self._client.scan_iter(match=self._prefix + "*", count=1000))
+            if keys:
+                self._client.unlink(*keys)
+        except self._errors as e:
+            self._failed("clear", e)
+
+
+def redis_tier(namespace: str) -> Optional[RedisTier]:
+    """配置了 REDIS_URL 时返回对应 namespace 的 Redis 缓存层，否则返回 None"""
+    return RedisTier(REDIS_URL, namespace) if REDIS_URL else None
+
+
 class Cache:
     """
     支持内存和 SQLite 持久化的缓存系统
@@ -36,6 +215,12 @@ class Cache:
     - 支持过期时间
     - 支持最大缓存条目限制
     - 自动清理过期数据
+    - 可选的写缓冲：累积多次 set 后在单个事务中批量落盘
+    - 可选的已知 key 集合：必然未命中的 key 不再查询 SQLite
+    - 异步写回：set_async 只更新内存并入队，由后台任务在线程池中批量落盘
+
+    分层：L1 进程内 LRU → L2 共享缓存层（可选，如 Redis）→ L3 SQLite；
+    读取时逐层向下查找，命中后回填到上层；写入时同时写入所有层
     """
     
     def __init__(
@@ -43,11 +228,29 @@ class Cache:
         db_path: str = ".cache/cache.db",
         max_memory_items: int = 1000,
         cleanup_interval: int = 3600,  # 1小时清理一次过期数据
+        pending_limit: int = 1,  # 写缓冲条数，1 表示每次 set 立即落盘
+        track_keys: bool = False,  # 在内存中记录已有 key，跳过必然未命中的 SQLite 查询
+        remote: Optional[CacheTier] = None,  # L2 共享缓存层
     ):
         self._memory_cache: OrderedDict[str, tuple[Any, float]] = OrderedDict()  # (value, expire_time)
+        # 内存缓存的读写（含 LRU 顺序调整）都在这把锁内完成，多线程访问时不会互相破坏链表
+        self._memory_lock = threading.Lock()
         self._max_memory_items = max_memory_items
         self._cleanup_interval = cleanup_interval
         self._last_cleanup = time.time()
+        self._ops_since_cleanup = 0
+        self._conn: Optional[sqlite3.Connection] = None  # 唯一的写连接
+        self._write_lock = threading.RLock()
+        self._readers: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._reader_count = 0
+        self._pending: list[tuple[str, bytes, float]] = []  # (key, value, expire_time)
+        self._pending_limit = max(pending_limit, 1)
+        self._remote = remote
+        # 异步写回队列与后台任务，首次调用 set_async 时在当前事件循环中创建
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # clear() 时递增；写回时丢弃旧代次的数据，避免清空前入队的写入在清空后重新落盘
+        self._generation = 0
         
         # 确保缓存目录存在
         path = Path(db_path)
@@ -56,30 +259,149 @@ class Cache:
         
         # 初始化数据库
         self._init_db()
+        
+        # 已知 key 集合：只反映本实例加载时的数据和之后自己的写入，
+        # 适用于单写者场景；其他实例新写入的 key 在这里会被当作未命中
+        self._known_keys: Optional[set[str]] = None
+        if track_keys:
+            rows = self._writer().execute(
+                "SELECT key FROM cache WHERE expire_time > ?", (time.time(),)
+            )
+            self._known_keys = {row[0] for row in rows}
+        
+        # 启用写缓冲时，进程退出前把未落盘的数据写入数据库
+        if self._pending_limit > 1:
+            atexit.register(self.flush)
     
     def _init_db(self) -> None:
         """初始化 SQLite 数据库表"""
-        with self._get_db() as (conn, cur):
-            cur.execute("""
+        with self._write_lock:
+            conn = self._writer()
+            # 旧版本以 TEXT 存储 value；缓存可再生，直接重建表即可
+            columns = {
+                row[1]: row[2] for row in conn.execute("PRAGMA table_info(cache)")
+            }
+            if columns.get("value", "BLOB").upper() != "BLOB":
+                logger.info("Dropping cache table with outdated schema")
+                conn.execute("DROP TABLE cache")
+            conn.execute("""
                 CREATE TABLE IF NOT EXISTS cache (
                     key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
+                    value BLOB NOT NULL,
                     expire_time REAL NOT NULL
                 )
             """)
-            conn.commit()
+            # 过期清理按 expire_time 范围删除，走索引
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_expire ON cache(expire_time)"
+            )
+    
+    def _writer(self) -> sqlite3.Connection:
+        """返回复用的写连接，首次调用时创建"""
+        if self._conn is None:
+            with self._write_lock:
+                if self._conn is None:
+                    # autocommit 模式：每条语句独立提交，无需显式 commit
+                    conn = sqlite3.connect(
+                        self._db_path, check_same_thread=False, isolation_level=None
+                    )
+                    self._apply_pragmas(conn)
+                    self._conn = conn
+        return self._conn
+    
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """从只读连接池借出一个连接，池未满时按需创建"""
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._write_lock:
+            if self._reader_count < READER_POOL_SIZE:
+                self._reader_count += 1
+                uri = f"{Path(self._db_path).resolve().as_uri()}?mode=ro"
+                conn = sqlite3.connect(
+                    uri, uri=True, check_same_thread=False, isolation_level=None
+                )
+                self._apply_pragmas(conn, writer=False)
+                return conn
+        return self._readers.get()
     
-    @contextmanager
-    def _get_db(self):
-        """获取数据库连接的上下文管理器"""
-        conn = sqlite3.connect(self._db_path)
+    def _query_one(self, sql: str, params: tuple) -> Optional[tuple]:
+        """在只读连接上执行查询并返回第一行"""
+        if self._db_path.startswith(":memory:"):
+            # 内存数据库无法被其他连接共享，只能走写连接
+            return self._writer().execute(sql, params).fetchone()
+        conn = self._acquire_reader()
         try:
-            yield conn, conn.cursor()
+            return conn.execute(sql, params).fetchone()
         finally:
-            conn.close()
+            self._readers.put(conn)
+    
+    def _query_all(self, sql: str, params: tuple) -> list[tuple]:
+        """在只读连接上执行查询并返回所有行"""
+        if self._db_path.startswith(":memory:"):
+            return self._writer().execute(sql, params).fetchall()
+        conn = self._acquire_reader()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            self._readers.put(conn)
+
+    def close(self) -> None:
+        """落盘写缓冲并关闭所有数据库连接，之后再次访问会自动重连"""
+        with self._write_lock:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            while self._reader_count:
+                self._readers.get().close()
+                self._reader_count -= 1
+    
+    def flush(self) -> None:
+        """将写缓冲中的数据在单个事务内批量写入数据库"""
+        with self._write_lock:
+            if not self._pending:
+                return
+            conn = self._writer()
+            # BEGIN IMMEDIATE 一开始就拿到写锁，避免事务中途 SQLITE_BUSY
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cache (key, value, expire_time) VALUES (?, ?, ?)",
+                    self._pending,
+                )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self._pending.clear()
+    
+    def _apply_pragmas(self, conn: sqlite3.Connection, writer: bool = True) -> None:
+        """为新连接设置 PRAGMA（WAL 日志 + 放宽同步，避免每次提交都 fsync）"""
+        if self._db_path.startswith(":memory:"):
+            return
+        # journal_mode 会持久化到数据库文件，只需写连接设置；其余 PRAGMA 仅对当前连接生效
+        if writer:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            f"""
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA mmap_size={SQLITE_MMAP_SIZE};
+            PRAGMA cache_size={SQLITE_CACHE_SIZE};
+            PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};
+            """
+        )
     
     def _cleanup_expired(self, force: bool = False) -> None:
         """清理过期的缓存数据"""
+        # 每 CLEANUP_CHECK_OPS 次操作才读取一次时钟，绝大多数调用只做整数比较
+        if not force:
+            self._ops_since_cleanup += 1
+            if self._ops_since_cleanup < CLEANUP_CHECK_OPS:
+                return
+            self._ops_since_cleanup = 0
         now = time.time()
         
         # 检查是否需要清理
@@ -87,22 +409,30 @@ class Cache:
             return
         
         # 清理内存缓存
-        expired_keys = [
-            k for k, (_, expire_time) in self._memory_cache.items()
-            if expire_time < now
-        ]
-        for k in expired_keys:
-            del self._memory_cache[k]
+        with self._memory_lock:
+            expired_keys = [
+                k for k, (_, expire_time) in self._memory_cache.items()
+                if expire_time < now
+            ]
+            for k in expired_keys:
+                del self._memory_cache[k]
         
         # 清理数据库缓存
-        with self._get_db() as (conn, cur):
-            cur.execute("DELETE FROM cache WHERE expire_time < ?", (now,))
-            conn.commit()
+        with self._write_lock:
+            self._writer().execute("DELETE FROM cache WHERE expire_time < ?", (now,))
         
         self._last_cleanup = now
         if expired_keys:
             logger.debug("Cleaned up %d expired cache items", len(expired_keys))
     
+    def _remember(self, key: str, value: Any, expire_time: float) -> None:
+        """写入内存缓存，超出上限时 O(1) 淘汰最久未使用的条目"""
+        with self._memory_lock:
+            self._memory_cache[key] = (value, expire_time)
+            self._memory_cache.move_to_end(key)
+            if len(self._memory_cache) > self._max_memory_items:
+                self._memory_cache.popitem(last=False)
+    
     def get(self, key: str) -> Optional[Any]:
         """
         获取缓存值，如果不存在或已过期返回 None
@@ -115,29 +445,98 @@ class Cache:
         """
         self._cleanup_expired()
         
-        # 先查内存缓存
-        if key in self._memory_cache:
-            value, expire_time = self._memory_cache[key]
-            if expire_time > time.time():
-                return value
-            del self._memory_cache[key]
-        
-        # 再查数据库缓存
-        with self._get_db() as (_, cur):
-            cur.execute(
-                "SELECT value, expire_time FROM cache WHERE key = ?",
-                (key,)
-            )
-            row = cur.fetchone()
-            
-            if row and row[1] > time.time():
-                value = json.loads(row[0])
-                # 提升到内存缓存
-                self._memory_cache[key] = (value, row[1])
-                return value
+        # 先查内存缓存：命中是常见路径，直接取值并捕获 KeyError，比先判断再取值少一次查找
+        with self._memory_lock:
+            try:
+                value, expire_time = self._memory_cache[key]
+            except KeyError:
+                pass
+            else:
+                if expire_time > time.time():
+                    self._memory_cache.move_to_end(key)
+                    return value
+                del self._memory_cache[key]
+
+        # 再查共享缓存层
+        if self._remote is not None:
+            hit = self._remote.get_many([key]).get(key)
+            if hit is not None:
+                self._remember(key, *hit)
+                return hit[0]
+        
+        # 确定不存在的 key 无需访问数据库
+        if self._known_keys is not None and key not in self._known_keys:
+            return None
+        
+        # 再查数据库缓存（先落盘写缓冲，避免读到旧数据）
+        if self._pending:
+            self.flush()
+        # 过期行在 SQL 层就被排除，不会把旧的 value 读到 Python 中解析
+        row = self._query_one(
+            "SELECT value, expire_time FROM cache WHERE key = ? AND expire_time > ?",
+            (key, time.time()),
+        )
+        if row:
+            value = _decode(row[0])
+            # 提升到上层缓存
+            self._remember(key, value, row[1])
+            if self._remote is not None:
+                self._remote.set_many([(key, value, row[1])])
+            return value
         
         return None
     
+    def get_many(self, keys: list[str]) -> dict[str, Any]:
+        """
+        批量获取缓存值，未命中或已过期的 key 不出现在结果中
+
+        内存未命中的 key 合并为少量 IN 查询，避免逐个 SELECT
+        """
+        self._cleanup_expired()
+        now = time.time()
+        found: dict[str, Any] = {}
+        missing: list[str] = []
+        with self._memory_lock:
+            for key in keys:
+                entry = self._memory_cache.get(key)
+                if entry is not None:
+                    if entry[1] > now:
+                        self._memory_cache.move_to_end(key)
+                        found[key] = entry[0]
+                        continue
+                    del self._memory_cache[key]
+                missing.append(key)
+
+        if self._remote is not None and missing:
+            for key, (value, expire_time) in self._remote.get_many(missing).items():
+                self._remember(key, value, expire_time)
+                found[key] = value
+            missing = [key for key in missing if key not in found]
+        if self._known_keys is not None:
+            missing = [key for key in missing if key in self._known_keys]
+        if not missing:
+            return found
+
+        if self._pending:
+            self.flush()
+        promoted: list[tuple[str, Any, float]] = []
+        # 控制单条语句的参数个数，低于 SQLite 的默认上限
+        for start in range(0, len(missing), GET_MANY_CHUNK):
+            chunk = missing[start:start + GET_MANY_CHUNK]
+            rows = self._query_all(
+                "SELECT key, value, expire_time FROM cache "
+                f"WHERE key IN ({','.join('?' * len(chunk))}) AND expire_time > ?",
+                (*chunk, now),
+            )
+            for key, raw, expire_time in rows:
+                value = _decode(raw)
+                self._remember(key, value, expire_time)
+                promoted.append((key, value, expire_time))
+                found[key] = value
+        if self._remote is not None:
+            self._remote.set_many(promoted)
+        return found
+
     def set(
         self,
         key: str,
@@ -154,20 +553,113 @@ class Cache:
         """
         expire_time = time.time() + expire_in
         
-        # 写入内存缓存（保持插入顺序，FIFO 淘汰）
-        self._memory_cache[key] = (value, expire_time)
-        self._memory_cache.move_to_end(key)
-        if len(self._memory_cache) > self._max_memory_items:
-            self._memory_cache.popitem(last=False)
-        
-        # 写入数据库缓存
-        with self._get_db() as (conn, cur):
-            cur.execute(
-                "INSERT OR REPLACE INTO cache (key, value, expire_time) VALUES (?, ?, ?)",
-                (key, json.dumps(value), expire_time)
-            )
-            conn.commit()
+        # 写入内存缓存
+        self._remember(key, value, expire_time)
+        if self._known_keys is not None:
+            self._known_keys.add(key)
+        if self._remote is not None:
+            self._remote.set_many([(key, value, expire_time)])
+        
+        # 写入数据库缓存（先进入写缓冲，攒满后批量提交）
+        with self._write_lock:
+            self._pending.append((key, _encode(value), expire_time))
+            if len(self._pending) >= self._pending_limit:
+                self.flush()
     
+    def set_many(self, items: Iterable[tuple[str, Any]], expire_in: int = 86400) -> None:
+        """
+        批量设置缓存值，连同写缓冲中已有的数据在单个事务内落盘
+
+        Args:
+            items: (key, value) 序列
+            expire_in: 过期时间（秒），默认1天
+        """
+        expire_time = time.time() + expire_in
+        items = [(key, value, expire_time) for key, value in items]
+        if self._remote is not None:
+            self._remote.set_many(items)
+        with self._write_lock:
+            for key, value, _ in items:
+                self._remember(key, value, expire_time)
+                if self._known_keys is not None:
+                    self._known_keys.add(key)
+                self._pending.append((key, _encode(value), expire_time))
+            self.flush()
+
+    def set_async(self, key: str, value: Any, expire_in: int = 86400) -> None:
+        """
+        非阻塞地设置缓存值：立即写入内存缓存，持久化交给后台写回任务
+
+        必须在事件循环中调用；退出前应 await aflush() 确保数据落盘
+        """
+        expire_time = time.time() + expire_in
+        self._remember(key, value, expire_time)
+        if self._known_keys is not None:
+            self._known_keys.add(key)
+
+        loop = asyncio.get_running_loop()
+        if self._writer_task is None or self._writer_task.get_loop() is not loop:
+            # 事件循环变化时旧队列已不可用：遗留的数据先同步落盘，再为当前循环重建队列
+            self._persist_stale_queue()
+            self._write_queue = asyncio.Queue()
+            self._writer_task = loop.create_task(self._write_back())
+        self._write_queue.put_nowait((self._generation, key, value, expire_time))
+
+    def _persist_stale_queue(self) -> None:
+        """同步写入旧事件循环遗留在写回队列中的数据（如调用方退出前没有 aflush）"""
+        stale = self._write_queue
+        if stale is None or stale.empty():
+            return
+        items = []
+        while not stale.empty():
+            items.append(stale.get_nowait())
+        logger.info("Persisting %d cache writes queued on a previous event loop", len(items))
+        self._write_batch(items)
+
+    async def _write_back(self) -> None:
+        """后台写回：攒一小段时间的数据，在线程池中单个事务内落盘，队列清空后退出"""
+        write_queue = self._write_queue
+        loop = asyncio.get_running_loop()
+        try:
+            while not write_queue.empty():
+                await asyncio.sleep(WRITE_BACK_DELAY)
+                items = []
+                while not write_queue.empty():
+                    items.append(write_queue.get_nowait())
+                try:
+                    await loop.run_in_executor(None, self._write_batch, items)
+                except Exception as e:
+                    logger.error("Failed to write back %d cache items: %s", len(items), e)
+                finally:
+                    for _ in items:
+                        write_queue.task_done()
+        finally:
+            if self._write_queue is write_queue:
+                self._writer_task = None
+
+    def _write_batch(self, items: list[tuple[int, str, Any, float]]) -> None:
+        """将写回队列中的一批 (代次, key, value, 过期时间) 写入共享缓存层和 SQLite"""
+        with self._write_lock:
+            # 与 clear() 共用写锁：clear 之前入队的数据在这里被丢弃
+            live = [
+                (key, value, expire_time)
+                for generation, key, value, expire_time in items
+                if generation == self._generation
+            ]
+            if not live:
+                return
+            if self._remote is not None:
+                self._remote.set_many(live)
+            self._pending.extend(
+                (key, _encode(value), expire_time) for key, value, expire_time in live
+            )
+            self.flush()
+
+    async def aflush(self) -> None:
+        """等待写回队列中的数据全部落盘"""
+        if self._write_queue is not None and self._writer_task is not None:
+            await self._write_queue.join()
+
     def delete(self, key: str) -> None:
         """
         删除缓存项
@@ -176,25 +668,38 @@ class Cache:
             key: 要删除的缓存键
         """
         # 从内存缓存中删除
-        self._memory_cache.pop(key, None)
+        with self._memory_lock:
+            self._memory_cache.pop(key, None)
+        if self._known_keys is not None:
+            self._known_keys.discard(key)
+        if self._remote is not None:
+            self._remote.delete(key)
         
         # 从数据库缓存中删除
-        with self._get_db() as (conn, cur):
-            cur.execute("DELETE FROM cache WHERE key = ?", (key,))
-            conn.commit()
+        with self._write_lock:
+            self.flush()
+            self._writer().execute("DELETE FROM cache WHERE key = ?", (key,))
     
     def clear(self) -> None:
         """清空所有缓存"""
-        self._memory_cache.clear()
-        with self._get_db() as (conn, cur):
-            cur.execute("DELETE FROM cache")
-            conn.commit() 
+        with self._memory_lock:
+            self._memory_cache.clear()
+        if self._known_keys is not None:
+            self._known_keys.clear()
+        with self._write_lock:
+            if self._remote is not None:
+                self._remote.clear()
+            self._generation += 1
+            self._pending.clear()
+            self._writer().execute("DELETE FROM cache")
 
 # ------------- 缓存实例 -------------
 _cache = Cache(
-    db_path=os.getenv("CACHE_DB_PATH", ".cache/cache.db"),
+    db_path=CACHE_DB_PATH,
     max_memory_items=int(os.getenv("CACHE_MAX_MEMORY_ITEMS", "1000")),
     cleanup_interval=int(os.getenv("CACHE_CLEANUP_INTERVAL", "3600")),
+    pending_limit=int(os.getenv("CACHE_PENDING_LIMIT", "1")),
+    remote=redis_tier("default"),
 )
 
 def get_cache(key: str) -> Any | None:
@@ -1,38 +1,54 @@
 """缓存 key 生成与管理模块"""
 import hashlib
-import json
-from typing import Any, Dict
+from datetime import datetime
 
-from config import MODEL_NAME, SUMMARY_PROMPT
+import orjson
 
-def _hash_dict(data: Dict[str, Any]) -> str:
-    """将字典转换为稳定的哈希值"""
-    serialized = json.dumps(data, sort_keys=True)
-    return hashlib.sha256(serialized.encode()).hexdigest()
+from config import (
+    BATCH_SUMMARY_PROMPT,
+    BATCH_SUMMARY_SYSTEM_PROMPT,
+    MODEL_NAME,
+    PRIORITY_STRINGS,
+    SUMMARY_PROMPT,
+    SUMMARY_SYSTEM_PROMPT,
+    TYPE_STRINGS,
+)
+
+# 缓存键不涉及安全场景，只需分布均匀；BLAKE2b 比 SHA-256 更快，16 字节摘要足够区分
+KEY_DIGEST_SIZE = 16
+
+def _hash_bytes(data: bytes) -> str:
+    """计算缓存键使用的短哈希（32 位十六进制）"""
+    return hashlib.blake2b(data, digest_size=KEY_DIGEST_SIZE).hexdigest()
+
+# 模型与提示词是模块常量，导入时计算一次即可（任一变化都会使摘要缓存失效）
+_SUMMARY_CONTEXT = _hash_bytes(
+    "\0".join((
+        MODEL_NAME,
+        SUMMARY_SYSTEM_PROMPT,
+        SUMMARY_PROMPT,
+        BATCH_SUMMARY_SYSTEM_PROMPT,
+        BATCH_SUMMARY_PROMPT,
+    )).encode()
+)
+# 分类规则同样在导入时哈希一次，规则变化后旧的分类结果自动失效
+_CLASSIFY_CONTEXT = _hash_bytes(orjson.dumps((TYPE_STRINGS, PRIORITY_STRINGS)))
 
 def get_github_issues_key(repo: str, token: str | None) -> str:
     """生成 GitHub Issues 列表的缓存键"""
-    key_data = {
-        "repo": repo,
-        "token_hash": hashlib.sha256(token.encode()).hexdigest() if token else "no_token",
-        "type": "github_issues",
-    }
-    return f"github_issues:{_hash_dict(key_data)}"
-
-def get_summary_key(
-    issue_number: int,
-    issue_title: str,
-    issue_body: str | None,
-    updated_at: str,
-) -> str:
+    # 固定的字节布局（\0 分隔）直接哈希，无需先构造并序列化字典
+    digest = _hash_bytes(b"\0".join((repo.encode(), (token or "").encode())))
+    return f"github_issues:{digest}"
+
+def get_summary_key(repo: str, issue_number: int, updated_at: datetime) -> str:
     """生成摘要的缓存键，包含模型和提示词上下文"""
-    key_data = {
-        "number": issue_number,
-        "title": issue_title,
-        "body": issue_body,
-        "updated_at": updated_at,
-        # 上下文信息
-        "model": MODEL_NAME,
-        "prompt_hash": hashlib.sha256(SUMMARY_PROMPT.encode()).hexdigest(),
-    }
-    return f"summary:{_hash_dict(key_data)}" 
\ No newline at end of file
+    # GitHub 在标题/正文每次编辑时都会更新 updated_at，直接拼接即可，无需哈希
+    return f"summary:{_SUMMARY_CONTEXT}:{repo}#{issue_number}:{int(updated_at.timestamp())}"
+
+def get_classify_key(repo: str, issue_number: int, updated_at: datetime) -> str:
+    """生成分类结果的缓存键，包含分类规则上下文"""
+    return f"classify:{_CLASSIFY_CONTEXT}:{repo}#{issue_number}:{int(updated_at.timestamp())}"
+
+def get_semantic_namespace(embedding_model: str) -> str:
+    """语义缓存的命名空间：嵌入模型或摘要上下文变化后，旧向量不再参与匹配"""
+    return f"{embedding_model}:{_SUMMARY_CONTEXT}"
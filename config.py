@@ -4,6 +4,8 @@
 import os
 import re
 
+import ahocorasick
+
 # ---------- 结束关键词 ----------
 DONE_KEYWORDS = {
     kw.strip()
@@ -13,6 +15,22 @@ DONE_KEYWORDS = {
     ).split(",")
 }
 
+
+def _build_automaton(words: set[str]) -> ahocorasick.Automaton | None:
+    """构建 Aho-Corasick 自动机，没有关键词时返回 None"""
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        if word:
+            automaton.add_word(word, word)
+    if not len(automaton):
+        return None
+    automaton.make_automaton()
+    return automaton
+
+
+# 所有关键词构建为一个自动机，对小写化的正文单次线性扫描即可判断是否命中
+DONE_AUTOMATON = _build_automaton({kw.lower() for kw in DONE_KEYWORDS})
+
 # ---------- 噪声标签 ----------
 NOISE_LABELS = {
     lbl.strip()
@@ -21,6 +39,7 @@ NOISE_LABELS = {
         "wontfix,invalid,duplicate,help wanted,good first issue",
     ).split(",")
 }
+NOISE_LABELS_LOWER = frozenset(lbl.casefold() for lbl in NOISE_LABELS)
 
 # ---------- 类型关键词 ----------
 TYPE_STRINGS = {
@@ -32,7 +51,9 @@ TYPE_STRINGS = {
     "Security": [r"\bsecurity\b"],
     "Question": [r"\bquestion\b", r"\bhow to\b"],
 }
-TYPE_PATTERNS = TYPE_STRINGS
+# 每个类别的多个模式合并为一个预编译的正则，按类别顺序依次匹配；
+# 模式均为小写，匹配前先将文本整体小写化，无需 re.I 逐字符折叠大小写
+TYPE_PATTERNS = {k: re.compile("|".join(pats)) for k, pats in TYPE_STRINGS.items()}
 
 # ---------- 优先级关键词 ----------
 PRIORITY_STRINGS = {
@@ -40,13 +61,29 @@ PRIORITY_STRINGS = {
     "P1": ["priority/major", "major"],
     "P2": ["priority/minor", "minor"],
 }
-PRIORITY_RULES = PRIORITY_STRINGS
+PRIORITY_RULES = {
+    k: re.compile("|".join(pats)) for k, pats in PRIORITY_STRINGS.items()
+}
+# 标签名 -> 优先级（倒序构造，同一标签出现在多个优先级时保留靠前的）
+PRIORITY_LABELS = {
+    s.strip("/"): k
+    for k, strings in reversed(PRIORITY_STRINGS.items())
+    for s in strings
+}
 
 # ---------- LLM 配置 ----------
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 MODEL_NAME = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
-SUMMARY_PROMPT = """你是一个专业的 GitHub Issue 分析助手。请根据以下 Issue 的信息生成一句话摘要。
+
+# ---------- 语义缓存（默认关闭）----------
+# 开启后，精确缓存未命中的 issue 会先计算嵌入，与已有摘要的相似度达到阈值即直接复用
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "").lower() in ("1", "true", "yes")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# 提示词拆分为固定的 system 消息与按 issue 变化的 user 消息：所有请求共享完全相同的前缀，
+# 便于服务端前缀缓存（KV cache 复用，降低首 token 延迟，部分厂商对缓存 token 打折）
+SUMMARY_SYSTEM_PROMPT = """你是一个专业的 GitHub Issue 分析助手。请根据用户给出的 Issue 信息生成一句话摘要。
 
 要求：
 1. 摘要长度控制在 30 个汉字以内
@@ -56,12 +93,6 @@ SUMMARY_PROMPT = """你是一个专业的 GitHub Issue 分析助手。请根据
 5. 如果是 bug，说明具体问题而不是泛泛而谈
 6. 如果是功能请求，说明具体需求而不是抽象描述
 
-Issue 类型：{type_}
-Issue 优先级：{priority}
-Issue 标题：{title}
-Issue 正文：
-{body}
-
 以下是一些示例：
 Bug 示例：
 - 输入：标题："Login page crashes on Firefox"
@@ -71,4 +102,28 @@ Bug 示例：
 - 输入：标题："Add dark mode support"
 - 摘要：「添加深色主题支持」
 
-请仅返回摘要，不要包含任何其他内容："""
\ No newline at end of file
+请仅返回摘要，不要包含任何其他内容。"""
+
+SUMMARY_PROMPT = """Issue 类型：{type_}
+Issue 优先级：{priority}
+Issue 标题：{title}
+Issue 正文：
+{body}"""
+
+BATCH_SUMMARY_SYSTEM_PROMPT = """你是一个专业的 GitHub Issue 分析助手。请为用户给出的列表中的每个 Issue 分别生成一句话摘要。
+
+要求：
+1. 每条摘要长度控制在 30 个汉字以内，并用「」包裹
+2. 保持客观准确，不要添加主观评价
+3. 优先关注问题的核心诉求或关键影响
+4. 使用统一的语言风格和标点符号
+5. 如果是 bug，说明具体问题而不是泛泛而谈
+6. 如果是功能请求，说明具体需求而不是抽象描述
+
+示例摘要：「Firefox 浏览器登录页面崩溃」、「添加深色主题支持」
+
+请仅返回 JSON 对象，不要包含任何其他内容，格式为：
+{"summaries": [{"idx": 0, "summary": "「摘要」"}]}"""
+
+BATCH_SUMMARY_PROMPT = """Issue 列表（共 {count} 个，JSON 数组，idx 为编号）：
+{issues}"""
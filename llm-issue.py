@@ -25,43 +25,58 @@ if missing:
     print("[提示] 已写入 .env 文件，下次将自动加载。")
 
 import asyncio
-import json
-import re
+import math
 import sys
+from collections import Counter
+from operator import attrgetter
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 from typing import List, Optional, Tuple
 
 import httpx
+import msgspec
+import orjson
 import typer
-from pydantic import BaseModel
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.table import Table
 
-from cache_keys import get_github_issues_key
+from cache_keys import get_classify_key, get_github_issues_key
 from config import (
-    DONE_KEYWORDS,
-    NOISE_LABELS,
+    DONE_AUTOMATON,
+    NOISE_LABELS_LOWER,
+    PRIORITY_LABELS,
     PRIORITY_RULES,
-    PRIORITY_STRINGS,
     TYPE_PATTERNS,
 )
 from exceptions import GitHubError, RateLimitError, RepoNotFoundError, TokenError, NetworkError
-from llm_summary import summarize_batch
+from llm_summary import aclose as aclose_llm_client, summarize_batch
 from utils import setup_logger
-from cache import get_cache, set_cache
+from cache import Cache, cache_path, get_cache, redis_tier, set_cache
 
 logger = setup_logger()
 
+# 分类结果缓存（每页一次批量读取、一次事务写入）
+classify_cache = Cache(
+    db_path=cache_path("classify.db"), track_keys=True, remote=redis_tier("classify")
+)
+
+# 终端输出复用同一组 Console，避免每次调用重新探测终端
+console = Console()
+err_console = Console(stderr=True)  # 抓取进度条输出到 stderr
+
 # ---------- 常量 ----------
 GITHUB_API = "https://api.github.com"
 PER_PAGE = 100
 MAX_ITEMS = 10_000
 MAX_RETRIES = 3  # 最大重试次数
+PAGE_CACHE_EXPIRE = 7 * 86400  # 分页缓存保留时间，新鲜度由 ETag 重新验证保证
+PAGE_CONCURRENCY = 10  # 同时在途的最大页面请求数（GitHub 二级限流建议不要过高）
+CLASSIFY_CACHE_EXPIRE = 7 * 86400  # 分类结果保留时间，issue 更新后 key 随之变化
 
 # ---------- 数据模型 ----------
-class Issue(BaseModel):
+class Issue(msgspec.Struct):
     """单个 GitHub Issue 的结构化信息"""
 
     number: int
@@ -77,51 +92,37 @@ class Issue(BaseModel):
     priority: str = ""
 
     def to_dict(self) -> dict:
-        """兼容不同版本的Pydantic，将Issue对象转换为字典"""
-        try:
-            # 尝试使用 v2 方法
-            return self.model_dump(mode="json")
-        except AttributeError:
-            try:
-                # 尝试使用 v1 方法
-                return self.dict()
-            except AttributeError:
-                # 如果都失败，手动转换
-                return {
-                    "number": self.number,
-                    "title": self.title,
-                    "body": self.body,
-                    "labels": self.labels,
-                    "assignees": self.assignees,
-                    "state": self.state,
-                    "created_at": self.created_at.isoformat(),
-                    "updated_at": self.updated_at.isoformat(),
-                    "html_url": self.html_url,
-                    "type_": self.type_,
-                    "priority": self.priority,
-                }
+        """将 Issue 对象转换为可 JSON 序列化的字典（时间转为 ISO 8601 字符串）"""
+        return msgspec.to_builtins(self)
+
+
+if sys.version_info >= (3, 11):
+    # 3.11 起 fromisoformat 原生支持 GitHub 时间戳结尾的 "Z"，无需先替换字符串
+    _parse_ts = datetime.fromisoformat
+else:
+    def _parse_ts(value: str) -> datetime:
+        """解析 GitHub 返回的 ISO 8601 时间戳"""
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
 
 # ---------- 分类与过滤 ----------
 def classify_issue(issue: Issue) -> Issue:
     """根据标题和正文推断 issue 的类型与优先级"""
+    # 只小写化一次，之后所有正则都按区分大小写的方式匹配
     text = f"{issue.title} {issue.body or ''}".lower()
 
     # 类型
-    for issue_type, patterns in TYPE_PATTERNS.items():
-        if any(re.search(p, text, re.I) for p in patterns):
+    for issue_type, regex in TYPE_PATTERNS.items():
+        if regex.search(text):
             issue.type_ = issue_type
             break
     else:
         issue.type_ = "Other"
 
-    # 优先级
-    for prio, patterns in PRIORITY_RULES.items():
-        if any(re.search(p, text, re.I) for p in patterns):
-            issue.priority = prio
-            break
-        # 额外检查 label 里是否直接包含字符串
-        if any(s.strip("/") in issue.labels for s in PRIORITY_STRINGS[prio]):
+    # 优先级：label 里直接包含优先级字符串，或正文命中对应规则
+    label_prios = {PRIORITY_LABELS[l] for l in issue.labels if l in PRIORITY_LABELS}
+    for prio, regex in PRIORITY_RULES.items():
+        if prio in label_prios or regex.search(text):
             issue.priority = prio
             break
     else:
@@ -129,26 +130,49 @@ def classify_issue(issue: Issue) -> Issue:
     return issue
 
 
+def _classify_cached(issues: List[Issue], repo: str) -> None:
+    """批量分类，updated_at 未变化的 issue 直接复用缓存的分类结果"""
+    keys = [get_classify_key(repo, i.number, i.updated_at) for i in issues]
+    cached = classify_cache.get_many(keys)
+    fresh = []
+    for issue, key in zip(issues, keys):
+        hit = cached.get(key)
+        if hit:
+            issue.type_, issue.priority = hit
+            continue
+        classify_issue(issue)
+        fresh.append((key, [issue.type_, issue.priority]))
+    if fresh:
+        classify_cache.set_many(fresh, expire_in=CLASSIFY_CACHE_EXPIRE)
+
+
+def _is_done_or_noise(text: str, labels: List[str]) -> bool:
+    """正文含已完成关键词或带噪声标签时返回 True"""
+    if DONE_AUTOMATON is not None and next(DONE_AUTOMATON.iter(text.lower()), None):
+        return True
+    return any(lbl.casefold() in NOISE_LABELS_LOWER for lbl in labels)
+
+
 def should_include(issue: Issue) -> bool:
     """返回 True 表示保留该 issue"""
     if issue.state != "open":
         return False
     if issue.assignees:
         return False
-    content = f"{issue.title} {issue.body or ''}".lower()
-    if any(kw in content for kw in DONE_KEYWORDS):
-        return False
-    if any(lbl.lower() in map(str.lower, NOISE_LABELS) for lbl in issue.labels):
-        return False
-    return True
+    return not _is_done_or_noise(f"{issue.title} {issue.body or ''}", issue.labels)
 
 
 # ---------- GitHub API 相关 ----------
 async def _handle_github_response(
     r: httpx.Response,
     repo: str,
+    cached_page: Optional[dict] = None,
 ) -> Tuple[bool, Optional[List[dict]]]:
     """处理 GitHub API 响应，返回 (是否继续, 数据)"""
+    if r.status_code == 304 and cached_page is not None:
+        # 页面未变化：不消耗额度，直接使用缓存的数据
+        return True, cached_page["data"]
+
     if r.status_code == 404:
         raise RepoNotFoundError(f"Repository {repo} not found")
     
@@ -166,106 +190,219 @@ async def _handle_github_response(
     
     # 其他错误
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     if not data:
         return False, None
     
     return True, data
 
+def _slim_item(item: dict) -> dict:
+    """只保留构造 Issue 所需的字段，缩小分页缓存的体积"""
+    return {
+        "number": item["number"],
+        "title": item["title"],
+        "body": item.get("body"),
+        "labels": [{"name": l["name"]} for l in item["labels"]],
+        "assignees": [{"login": a["login"]} for a in item["assignees"]],
+        "state": item["state"],
+        "created_at": item["created_at"],
+        "updated_at": item["updated_at"],
+        "html_url": item["html_url"],
+    }
+
+
+async def _fetch_page(
+    client: httpx.AsyncClient,
+    repo: str,
+    headers: dict,
+    page: int,
+    semaphore: asyncio.Semaphore,
+    cache_prefix: str,
+) -> Tuple[Optional[List[dict]], httpx.Headers, int]:
+    """
+    抓取单页 issues（带重试），返回 (数据, 响应头, 总页数)；没有更多数据时数据为 None
+
+    只返回响应头而非响应对象，整页原始 JSON 在投影成精简字段后即可释放
+
+    每页的 ETag 与数据一起缓存，再次请求时带上 If-None-Match，未变化的页面返回 304
+    """
+    page_key = f"{cache_prefix}:page:{page}"
+    cached_page = get_cache(page_key)
+    if cached_page:
+        headers = {**headers, "If-None-Match": cached_page["etag"]}
+    for attempt in range(MAX_RETRIES):
+        try:
+            # 信号量只包住请求本身，重试前的等待不占用并发名额
+            async with semaphore:
+                r = await client.get(
+                    f"{GITHUB_API}/repos/{repo}/issues",
+                    headers=headers,
+                    params={
+                        "state": "open",
+                        "sort": "updated",
+                        "direction": "desc",
+                        "per_page": PER_PAGE,
+                        "page": page,
+                    },
+                )
+            should_continue, data = await _handle_github_response(r, repo, cached_page)
+            if not should_continue:
+                return None, r.headers, page
+            if r.status_code == 304:
+                return data, r.headers, cached_page["last_page"]
+            data = [_slim_item(item) for item in data if "pull_request" not in item]
+            last_page = _last_page(r)
+            if r.headers.get("etag"):
+                set_cache(
+                    page_key,
+                    {"etag": r.headers["etag"], "data": data, "last_page": last_page},
+                    expire_in=PAGE_CACHE_EXPIRE,
+                )
+            return data, r.headers, last_page
+        except RateLimitError as e:
+            if attempt == MAX_RETRIES - 1:
+                logger.error("Rate limit exceeded and max retries reached")
+                raise
+            wait = max(e.reset_time - int(datetime.now().timestamp()), 0) + 1
+            logger.warning("Rate limit exceeded, sleeping %ds (attempt %d/%d)", wait, attempt + 1, MAX_RETRIES)
+            await asyncio.sleep(wait)
+        except (httpx.RequestError, httpx.HTTPError) as e:
+            if attempt == MAX_RETRIES - 1:
+                logger.error("Network error after %d retries: %s", MAX_RETRIES, e)
+                raise NetworkError(f"Failed to fetch issues: {e}")
+            wait = 2 ** attempt
+            logger.warning("Network error, retrying in %ds (attempt %d/%d): %s", wait, attempt + 1, MAX_RETRIES, e)
+            await asyncio.sleep(wait)
+    logger.error("Failed to fetch issues after %d retries", MAX_RETRIES)
+    raise NetworkError("Failed to fetch issues after all retries")
+
+
+def _last_page(r: httpx.Response) -> int:
+    """从 Link 响应头的 rel="last" 中解析总页数，没有分页时返回 1"""
+    last = r.links.get("last")
+    if not last:
+        return 1
+    return int(httpx.URL(last["url"]).params.get("page", 1))
+
+
+async def _wait_for_rate_limit(headers_list: List[httpx.Headers]) -> None:
+    """剩余额度过低时，睡眠到额度重置"""
+    remain = min(int(h.get("x-ratelimit-remaining", 1)) for h in headers_list)
+    reset_ts = max(int(h.get("x-ratelimit-reset", 0)) for h in headers_list)
+    if remain < 10 and reset_ts:
+        wait = max(reset_ts - int(datetime.now().timestamp()), 0) + 1
+        logger.warning("Rate limit low (%d remaining), sleeping %ds", remain, wait)
+        await asyncio.sleep(wait)
+
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """返回进程内共享的 HTTP/2 客户端，同一事件循环内的多次运行复用连接池"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    # 连接绑定在创建时的事件循环上，循环更换或客户端已关闭时需重建
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=30,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def _aclose_client() -> None:
+    """关闭共享的 GitHub 客户端，下次调用 _get_client 时重建"""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client = _client_loop = None
+
+
 async def fetch_issues(repo: str, token: str | None, max_issues: int) -> List[Issue]:
     """抓取指定仓库的 open issues，自动停于 GitHub 上限或 max_issues"""
     headers = {"Accept": "application/vnd.github+json"}
     if token:
         headers["Authorization"] = f"Bearer {token}"
     issues: List[Issue] = []
-    page = 1
-    cache_key = get_github_issues_key(repo, token)
-    cached_data = get_cache(cache_key)
-    if cached_data:
-        logger.info("Using cached issues data")
-        return [Issue(**issue_dict) for issue_dict in cached_data][:max_issues]
-    async with httpx.AsyncClient(
-        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
-        timeout=30,
-    ) as client:
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            transient=True,
-            console=Console(stderr=True),
-        ) as progress:
-            task = progress.add_task("Fetching issues...", total=None)
-            while len(issues) < min(MAX_ITEMS, max_issues):
-                for attempt in range(MAX_RETRIES):
-                    try:
-                        r = await client.get(
-                            f"{GITHUB_API}/repos/{repo}/issues",
-                            headers=headers,
-                            params={
-                                "state": "open",
-                                "sort": "updated",
-                                "direction": "desc",
-                                "per_page": PER_PAGE,
-                                "page": page,
-                            },
-                        )
-                        should_continue, data = await _handle_github_response(r, repo)
-                        if not should_continue:
-                            break
-                        for item in data:
-                            if "pull_request" in item:
-                                continue
-                            issue = Issue(
-                                number=item["number"],
-                                title=item["title"],
-                                body=item.get("body") or "",
-                                labels=[l["name"] for l in item["labels"]],
-                                assignees=[a["login"] for a in item["assignees"]],
-                                state=item["state"],
-                                created_at=datetime.fromisoformat(
-                                    item["created_at"].replace("Z", "+00:00")
-                                ),
-                                updated_at=datetime.fromisoformat(
-                                    item["updated_at"].replace("Z", "+00:00")
-                                ),
-                                html_url=item["html_url"],
-                            )
-                            issue = classify_issue(issue)
-                            if should_include(issue):
-                                issues.append(issue)
-                                if len(issues) >= max_issues:
-                                    break
-                        if len(issues) >= max_issues:
-                            break
-                        remain = int(r.headers.get("x-ratelimit-remaining", 1))
-                        reset_ts = int(r.headers.get("x-ratelimit-reset", 0))
-                        if remain < 10 and reset_ts:
-                            wait = max(reset_ts - int(datetime.now().timestamp()), 0) + 1
-                            logger.warning("Rate limit low (%d remaining), sleeping %ds", remain, wait)
-                            await asyncio.sleep(wait)
-                        page += 1
-                        progress.update(task, advance=PER_PAGE)
+    limit = min(MAX_ITEMS, max_issues)
+    cache_prefix = get_github_issues_key(repo, token)
+    client = _get_client()
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        transient=True,
+        console=err_console,
+    ) as progress:
+        task = progress.add_task("Fetching issues...", total=None)
+        # 先抓第 1 页拿到总页数，之后并发抓取剩余页面（由信号量限制同时在途的请求数）
+        semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+        data, page_headers, last_page = await _fetch_page(
+            client, repo, headers, 1, semaphore, cache_prefix
+        )
+        pages = [(data, page_headers)]
+        fetched = 0
+        while True:
+            exhausted = False
+            for data, _ in pages:
+                if data is None:
+                    exhausted = True
+                    break
+                fetched += 1
+                progress.update(task, advance=PER_PAGE)
+                page_issues: List[Issue] = []
+                for item in data:
+                    # 先用廉价条件排除非 open 及已认领的条目，再构造 Issue（PR 已在抓取时剔除）
+                    if item["state"] != "open" or item["assignees"]:
+                        continue
+                    # 在原始字段上完成剩余过滤，被剔除的条目不再构造 Issue、解析时间
+                    title, body = item["title"], item.get("body") or ""
+                    labels = [l["name"] for l in item["labels"]]
+                    if _is_done_or_noise(f"{title} {body}", labels):
+                        continue
+                    # GitHub 返回的结构可信，msgspec.Struct 构造时不做校验
+                    issue = Issue(
+                        number=item["number"],
+                        title=title,
+                        body=body,
+                        labels=labels,
+                        assignees=[],
+                        state=item["state"],
+                        created_at=_parse_ts(item["created_at"]),
+                        updated_at=_parse_ts(item["updated_at"]),
+                        html_url=item["html_url"],
+                    )
+                    page_issues.append(issue)
+                    if len(issues) + len(page_issues) >= limit:
                         break
-                    except RateLimitError as e:
-                        if attempt == MAX_RETRIES - 1:
-                            logger.error("Rate limit exceeded and max retries reached")
-                            raise
-                        wait = max(e.reset_time - int(datetime.now().timestamp()), 0) + 1
-                        logger.warning("Rate limit exceeded, sleeping %ds (attempt %d/%d)", wait, attempt + 1, MAX_RETRIES)
-                        await asyncio.sleep(wait)
-                    except (httpx.RequestError, httpx.HTTPError) as e:
-                        if attempt == MAX_RETRIES - 1:
-                            logger.error("Network error after %d retries: %s", MAX_RETRIES, e)
-                            raise NetworkError(f"Failed to fetch issues: {e}")
-                        wait = 2 ** attempt
-                        logger.warning("Network error, retrying in %ds (attempt %d/%d): %s", wait, attempt + 1, MAX_RETRIES, e)
-                        await asyncio.sleep(wait)
-                else:
-                    logger.error("Failed to fetch issues after %d retries", MAX_RETRIES)
-                    raise NetworkError("Failed to fetch issues after all retries")
+                _classify_cached(page_issues, repo)
+                issues.extend(page_issues)
+                if len(issues) >= limit:
+                    break
+            next_page = fetched + 1
+            if exhausted or len(issues) >= limit or next_page > last_page:
+                break
+            await _wait_for_rate_limit([h for _, h in pages])
+
+            # 按已抓页面的保留率估算还需多少页，避免一次性抓取过多
+            kept_per_page = len(issues) / fetched
+            needed = (
+                math.ceil((limit - len(issues)) / kept_per_page)
+                if kept_per_page
+                else PAGE_CONCURRENCY
+            )
+            window = range(next_page, min(next_page + needed, last_page + 1))
+            results = await asyncio.gather(
+                *(
+                    _fetch_page(client, repo, headers, p, semaphore, cache_prefix)
+                    for p in window
+                )
+            )
+            pages = [(data, h) for data, h, _ in results]
     logger.info("Fetched %d issues after filtering", len(issues))
-    issues_data = [issue.to_dict() for issue in issues]
-    set_cache(cache_key, issues_data, expire_in=300)
     return issues[:max_issues]
 
 
@@ -273,17 +410,16 @@ async def fetch_issues(repo: str, token: str | None, max_issues: int) -> List[Is
 async def build_summary_async(issues: List[Issue], repo: str) -> tuple[str, str]:
     """生成项目总览与 Markdown 表格"""
     total = len(issues)
-    bugs = sum(1 for i in issues if i.type_ == "Bug")
-    features = sum(1 for i in issues if i.type_ == "Feature Request")
     scores = {"P0": 0, "P1": 1, "P2": 2}
-    avg_score = (
-        round(sum(scores.get(i.priority, 2) for i in issues) / total) if total else 2
-    )
-    latest = (
-        max(issues, key=lambda i: i.updated_at).updated_at.strftime("%Y-%m-%d")
-        if issues
-        else "N/A"
-    )
+    # 计数与取最大值都交给 C 实现的 Counter / max，避免 Python 层逐条累加
+    types = Counter(map(attrgetter("type_"), issues))
+    priorities = Counter(map(attrgetter("priority"), issues))
+    score_sum = sum(scores.get(p, 2) * n for p, n in priorities.items())
+    latest_ts = max(map(attrgetter("updated_at"), issues), default=None)
+    bugs = types["Bug"]
+    features = types["Feature Request"]
+    avg_score = round(score_sum / total) if total else 2
+    latest = latest_ts.strftime("%Y-%m-%d") if latest_ts else "N/A"
     oneliner = (
         f"{repo} 目前共有 **{total}** 个待解决 Issue"
         f"（Bug {bugs} 个 / 新功能 {features} 个），"
@@ -305,28 +441,36 @@ async def build_summary_async(issues: List[Issue], repo: str) -> tuple[str, str]
     return oneliner, "\n".join(md_rows)
 
 
-def save_outputs(repo: str, oneliner: str, md_table: str, issues: List[Issue]) -> None:
+def _write_issues_json(path: Path, issues: List[Issue]) -> None:
+    """将过滤后的 issues 写为 JSON 文件"""
+    # Struct 浅拷贝为 dict 后交给 orjson，在 C 层完成缩进格式化并原生序列化 datetime
+    path.write_bytes(
+        orjson.dumps(issues, default=msgspec.structs.asdict, option=orjson.OPT_INDENT_2)
+    )
+
+
+async def save_outputs(repo: str, oneliner: str, md_table: str, issues: List[Issue]) -> None:
     """保存结果到本地文件"""
     out_dir = Path("output")
     out_dir.mkdir(exist_ok=True)
     summary = f"# {repo} Issues 速览\n\n{oneliner}\n\n{md_table}"
-    (out_dir / "summary.md").write_text(summary, encoding="utf-8")
-    (out_dir / "filtered_issues.json").write_text(
-        json.dumps(
-            [i.model_dump(mode="json") for i in issues],
-            ensure_ascii=False,
-            indent=2,
-            default=str,
+    # 编码与写盘立即提交到线程池并发执行，主线程同时渲染表格，不阻塞事件循环
+    loop = asyncio.get_running_loop()
+    writes = [
+        loop.run_in_executor(
+            None, partial((out_dir / "summary.md").write_text, summary, encoding="utf-8")
         ),
-        encoding="utf-8",
-    )
-    console = Console()
+        loop.run_in_executor(
+            None, _write_issues_json, out_dir / "filtered_issues.json", issues
+        ),
+    ]
     table = Table(title=f"{repo} 速览（前 20）")
     for col in ["#Issue", "类型", "优先级", "标题"]:
         table.add_column(col, overflow="fold", max_width=30)
     for i in issues[:20]:
         table.add_row(str(i.number), i.type_, i.priority, i.title)
     console.print(table)
+    await asyncio.gather(*writes)
 
 
 # ---------- CLI ----------
@@ -345,8 +489,6 @@ def main(
 
 async def run(repo: str, token: str | None, max_issues: int) -> None:
     """异步主流程"""
-    console = Console()
-    
     try:
         with console.status("[bold green]正在抓取 Issues...") as status:
             issues = await fetch_issues(repo, token, max_issues)
@@ -358,7 +500,7 @@ async def run(repo: str, token: str | None, max_issues: int) -> None:
             oneliner, md_table = await build_summary_async(issues, repo)
             
             status.update("[bold green]正在保存结果...")
-            save_outputs(repo, oneliner, md_table, issues)
+            await save_outputs(repo, oneliner, md_table, issues)
             
             console.print("[green]✅ 完成！结果已保存至 output/ 目录[/]")
             
@@ -379,6 +521,10 @@ async def run(repo: str, token: str | None, max_issues: int) -> None:
         console.print(f"[red]❌ 未知错误: {e}[/]")
         logger.exception("Unexpected error")
         sys.exit(1)
+    finally:
+        # 连接池绑定在当前事件循环上，退出前显式关闭
+        await _aclose_client()
+        await aclose_llm_client()
 
 if __name__ == "__main__":
     app() 
\ No newline at end of file
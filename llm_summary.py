@@ -1,31 +1,69 @@
 """使用大模型为 Issue 生成一句话摘要"""
 import asyncio
-import hashlib
-import json
 import logging
 import os
+import random
 import re
+import string
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 from textwrap import shorten
-from typing import List, Optional, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
 
+import httpx
+import orjson
 from openai import AsyncOpenAI, APIError, APITimeoutError, RateLimitError
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.console import Console
 
-from cache import Cache
-from cache_keys import get_summary_key
+from cache import Cache, cache_path, redis_tier
+from cache_keys import get_semantic_namespace, get_summary_key
 from config import (
     OPENAI_BASE_URL,
     OPENAI_API_KEY,
     MODEL_NAME,
     SUMMARY_PROMPT,
+    SUMMARY_SYSTEM_PROMPT,
+    BATCH_SUMMARY_PROMPT,
+    BATCH_SUMMARY_SYSTEM_PROMPT,
+    SEMANTIC_CACHE,
+    EMBEDDING_MODEL,
+    SEMANTIC_CACHE_THRESHOLD,
 )
+from semantic_cache import SemanticCache
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
+
+def _compile_prompt(template: str) -> Callable[..., str]:
+    """
+    预解析 str.format 风格的提示词模板，返回等价于 template.format(**values) 的拼接函数
+
+    模板只在导入时解析一次，之后每次渲染只做一次 join，不再重复扫描整段模板
+    """
+    segments: List[tuple] = []  # (字段前的字面量, 字段名)
+    literal = ""
+    for text, field, spec, conversion in string.Formatter().parse(template):
+        if spec or conversion:
+            raise ValueError("Prompt templates only support plain {field} placeholders")
+        literal += text
+        if field is not None:
+            segments.append((literal, field))
+            literal = ""
+    tail = literal
+
+    def render(**values: Any) -> str:
+        parts = []
+        for text, field in segments:
+            parts.append(text)
+            parts.append(str(values[field]))
+        parts.append(tail)
+        return "".join(parts)
+
+    return render
+
 # 自定义异常类
 class LLMSummaryError(Exception):
     """LLM 摘要生成相关的异常基类"""
@@ -50,20 +88,84 @@ class LLMQualityError(LLMSummaryError):
 # 配置项
 DEFAULT_CONCURRENCY = "10"
 MAX_BATCH_SIZE = 50  # 每批处理的最大 issue 数量
+BATCH_N = max(int(os.getenv("LLM_BATCH_SIZE", "12")), 1)  # 单次 LLM 请求合并的 issue 数量，1 表示不合并
 CACHE_EXPIRE = 86400  # 缓存过期时间（1天）
+MAX_BODY_CHARS = 1500  # 发送给大模型的正文最大长度
 CONCURRENCY_LIMIT = int(os.getenv("LLM_CONCURRENCY_LIMIT", DEFAULT_CONCURRENCY))
+STREAM_TIMEOUT = 15  # 单条摘要流式请求的总超时（秒）
+# 各类错误的退避参数：(基数秒, 上限秒)
+RETRY_BACKOFF = {
+    "timeout": (0.2, 30),
+    "rate_limit": (1.0, 60),
+    "default": (0.2, 30),
+}
 
-# 初始化客户端
-client = AsyncOpenAI(base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY)
+# 独立的系统随机源，避免多个进程因相同种子产生同步的抖动序列
+_retry_random = random.SystemRandom()
 
-# 初始化缓存
-cache = Cache(db_path=".cache/summaries.db")
+# 提示词模板在导入时预解析
+_render_summary_prompt = _compile_prompt(SUMMARY_PROMPT)
+_render_batch_prompt = _compile_prompt(BATCH_SUMMARY_PROMPT)
 
-# 摘要质量检查的正则表达式
-SUMMARY_CHECKS = {
-    "length": re.compile(r"^[「『](.{5,30})[」』]$"),  # 检查长度和引号
-    "style": re.compile(r"[「『][^」』]+[」』]$"),  # 检查格式一致性
-}
+# 大模型客户端：显式的 HTTP/2 连接池，高并发时多个请求复用同一连接；
+# 重试由本模块自行控制（带抖动退避），关闭 SDK 内置重试以免叠加
+_client: Optional[AsyncOpenAI] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_client() -> AsyncOpenAI:
+    """返回当前事件循环共享的大模型客户端，循环更换或客户端已关闭时重建"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed() or _client_loop is not loop:
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=256, max_keepalive_connections=64, keepalive_expiry=30
+            ),
+            timeout=httpx.Timeout(connect=5, read=60, write=10, pool=5),
+        )
+        _client = AsyncOpenAI(
+            base_url=OPENAI_BASE_URL,
+            api_key=OPENAI_API_KEY,
+            http_client=http_client,
+            max_retries=0,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def aclose() -> None:
+    """等待摘要缓存落盘并关闭大模型 HTTP 连接池，应在事件循环结束前调用"""
+    global _client, _client_loop
+    await cache.aflush()
+    if _client is not None:
+        await _client.close()
+        _client = _client_loop = None
+
+# 摘要进度条使用独立的 Console，避免与调用方的 status 显示冲突
+console = Console()
+
+# 初始化缓存（摘要通过 set_async 写回队列批量落盘）
+cache = Cache(
+    db_path=cache_path("summaries.db"), track_keys=True, remote=redis_tier("summaries")
+)
+
+# 语义缓存（可选）：精确缓存未命中时，按嵌入相似度复用相近 issue 的摘要
+semantic_cache: Optional[SemanticCache] = (
+    SemanticCache(
+        db_path=cache_path("semantic.db"),
+        namespace=get_semantic_namespace(EMBEDDING_MODEL),
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+    )
+    if SEMANTIC_CACHE
+    else None
+)
+
+# 摘要质量检查：一次匹配同时检查引号、长度（5~30 字）以及内部不含多余的闭合引号
+SUMMARY_CHECK = re.compile(r"([「『])[^」』\n]{5,30}([」』])")
+SUMMARY_MIN_LEN, SUMMARY_MAX_LEN = 7, 32  # 含首尾引号的总长度范围
+QUOTE_PAIRS = {"「": "」", "『": "』"}
 
 # 记录降级原因
 class DegradationReason:
@@ -89,18 +191,104 @@ class DegradationReason:
 
 degradation_tracker = DegradationReason()
 
+# 运行指标：direct_hits 为原文足够短、未调用大模型直接作为摘要的 issue 数
+metrics: Counter = Counter()
+
+# 正在进行中的单条摘要请求：cache_key -> Future，相同 key 的并发调用共享同一次请求
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+class _InflightCancelled(Exception):
+    """共享请求的发起方被取消，等待者需要自行重新请求"""
+
 
 def _get_cache_key(issue) -> str:
     """生成 issue 的缓存键"""
-    # 使用 issue 的关键信息生成缓存键
-    key_data = {
-        "number": issue.number,
-        "title": issue.title,
-        "body": issue.body,
-        "updated_at": str(issue.updated_at),
-    }
-    key_str = json.dumps(key_data, sort_keys=True)
-    return f"summary:{hashlib.sha256(key_str.encode()).hexdigest()}"
+    # html_url 形如 https://github.com/{owner}/{repo}/issues/{number}
+    repo = issue.html_url.rsplit("/issues/", 1)[0].removeprefix("https://github.com/")
+    return get_summary_key(repo, issue.number, issue.updated_at)
+
+
+def _truncate_body(body: Optional[str]) -> str:
+    """截断正文；抓取时已将空正文规范为空字符串，这里只兜底 None"""
+    return body[:MAX_BODY_CHARS] if body else ""
+
+
+async def _embed_issues(issues: List) -> Optional[List[List[float]]]:
+    """一次请求为多个 issue 计算嵌入向量，失败时返回 None（跳过语义缓存）"""
+    try:
+        resp = await _get_client().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=[f"{issue.title}\n{_truncate_body(issue.body)}" for issue in issues],
+        )
+    except (APIError, httpx.HTTPError) as e:
+        logger.warning("Embedding request failed, skipping semantic cache: %s", e)
+        return None
+    return [item.embedding for item in resp.data]
+
+
+def _parse_batch_summaries(content: str, count: int) -> List[Optional[str]]:
+    """
+    解析批量摘要的 JSON 响应，按 idx 对齐到输入顺序
+
+    格式不符或数量不一致时整体返回 None 列表，由调用方逐个降级
+    """
+    try:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        logger.warning("Batch response is not valid JSON")
+        return [None] * count
+
+    items = data.get("summaries") if isinstance(data, dict) else data
+    if not isinstance(items, list) or len(items) != count:
+        logger.warning("Batch response does not contain %d summaries", count)
+        return [None] * count
+
+    summaries: List[Optional[str]] = [None] * count
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        idx, summary = item.get("idx"), item.get("summary")
+        if isinstance(idx, int) and 0 <= idx < count and isinstance(summary, str):
+            summaries[idx] = summary.strip()
+    return summaries
+
+
+_CLOSING_QUOTE = re.compile("[」』]")
+
+
+async def _stream_summary(**kwargs: Any) -> str:
+    """
+    以流式方式请求单条摘要，读到闭合引号即停止接收
+
+    摘要只需一对「」，闭合引号之后的内容一律丢弃，提前关闭流可以省下尾部的生成时间和 token
+    """
+    resp = await _get_client().chat.completions.create(stream=True, **kwargs)
+
+    parts: List[str] = []
+    try:
+        async for chunk in resp:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            match = _CLOSING_QUOTE.search(delta)
+            if match:
+                # 闭合引号常与后续标点同在一个片段（如「…」。），只保留到引号为止
+                parts.append(delta[:match.end()])
+                break
+            parts.append(delta)
+    finally:
+        await resp.close()
+    return "".join(parts)
+
+
+def _direct_summary(issue) -> Optional[str]:
+    """原文（标题 + 正文）本身就符合摘要格式时直接用作摘要，否则返回 None"""
+    raw = " ".join(filter(None, [issue.title.strip(), (issue.body or "").strip()]))
+    summary = f"「{raw}」"
+    return None if _check_summary_quality(summary) else summary
 
 
 def _check_summary_quality(summary: str) -> Optional[str]:
@@ -110,23 +298,94 @@ def _check_summary_quality(summary: str) -> Optional[str]:
     if not summary:
         return "摘要为空"
     
-    if not SUMMARY_CHECKS["length"].match(summary):
-        return "摘要长度不符或缺少引号"
-    
-    if not SUMMARY_CHECKS["style"].match(summary):
-        return "摘要格式不符合要求"
-    
+    # 先用长度做廉价的预筛，绝大多数不合格的输出无需进入正则
+    if not SUMMARY_MIN_LEN <= len(summary) <= SUMMARY_MAX_LEN:
+        return "摘要长度或格式不符合要求"
+
+    match = SUMMARY_CHECK.fullmatch(summary)
+    if not match:
+        return "摘要长度或格式不符合要求"
+
+    if QUOTE_PAIRS[match.group(1)] != match.group(2):
+        return "摘要引号不匹配"
+
     return None
 
 
-async def _get_retry_delay(error_type: str, attempt: int) -> float:
-    """根据错误类型和重试次数返回等待时间"""
-    if error_type == "timeout":
-        return 2 ** attempt  # 指数退避：1, 2, 4, 8...
-    elif error_type == "rate_limit":
-        return 5 * (attempt + 1)  # 线性增长：5, 10, 15...
-    else:
-        return 1  # 其他错误固定等待1秒
+def _get_retry_delay(error_type: str, attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    根据错误类型和重试次数返回等待时间（full jitter 指数退避）
+
+    在 [0, min(上限, 基数 * 2^attempt)] 内均匀取值，使并发任务的重试时间错开；
+    服务端给出 Retry-After 时以其为准
+    """
+    if retry_after is not None:
+        return retry_after
+    base, cap = RETRY_BACKOFF.get(error_type, RETRY_BACKOFF["default"])
+    return _retry_random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _is_retryable(error: Exception) -> bool:
+    """超时、连接错误、408/409/429 和 5xx 值得重试，其余 4xx 重试也不会成功"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status is None or status in (408, 409, 429) or status >= 500
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """从异常携带的响应头中解析 Retry-After（秒），没有或无法解析时返回 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        # Retry-After 也可能是 HTTP 日期格式，此时退回到计算的退避时间
+        return None
+    return None
+
+
+async def _run_bounded(coros: Iterable[Awaitable], limit: int) -> None:
+    """
+    按需从 coros 取出协程运行，同时存活的任务不超过 limit 个
+
+    coros 应为惰性的生成器，未轮到的协程不会提前创建；任一任务失败时取消其余任务并抛出该异常
+    """
+    pending: set = set()
+    it = iter(coros)
+    try:
+        while True:
+            # 先等出空位再取下一个协程：失败时不会留下已创建却从未 await 的协程
+            if len(pending) >= limit:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    task.result()
+            coro = next(it, None)
+            if coro is None:
+                break
+            pending.add(asyncio.ensure_future(coro))
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_EXCEPTION
+            )
+            for task in done:
+                task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
 
 
 async def summarize_batch(
@@ -164,42 +423,117 @@ async def summarize_batch(
         return results
 
     semaphore = asyncio.Semaphore(concurrency_limit)
-    console = Console()
-
-    async def _summarize_single_issue(issue):
-        """为单个 issue 生成摘要"""
-        # 检查缓存
-        cache_key = get_summary_key(
-            issue_number=issue.number,
-            issue_title=issue.title,
-            issue_body=issue.body,
-            updated_at=str(issue.updated_at),
+    # 本批新生成的摘要，结束时一次性写入缓存
+    fresh: Dict[str, str] = {}
+    # 只有大模型新生成的摘要写入语义缓存：本地降级的摘要不应被相近的 issue 复用，
+    # 语义命中的摘要已在缓存中，重复写入只会堆积近似重复的向量
+    generated: set = set()
+    vectors: Dict[str, List[float]] = {}
+
+    async def _summarize_group(group: List, keys: List[str]) -> List[Optional[str]]:
+        """一次请求为多个 issue 生成摘要，请求失败或不合格的位置返回 None"""
+        payload = [
+            {
+                "idx": idx,
+                "type": issue.type_,
+                "priority": issue.priority,
+                "title": issue.title,
+                "body": _truncate_body(issue.body),
+            }
+            for idx, issue in enumerate(group)
+        ]
+        prompt = _render_batch_prompt(
+            count=len(group), issues=orjson.dumps(payload).decode()
+        )
+        async with semaphore:
+            try:
+                resp = await _get_client().chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": BATCH_SUMMARY_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt},
+                    ],
+                    max_tokens=60 * len(group),
+                    temperature=0.3,
+                    response_format={"type": "json_object"},
+                )
+            except (APIError, httpx.HTTPError) as e:
+                logger.warning("Batch request failed, falling back to single requests: %s", e)
+                return [None] * len(group)
+
+        summaries = _parse_batch_summaries(
+            resp.choices[0].message.content or "", len(group)
         )
-        if not force_refresh:
-            cached = cache.get(cache_key)
-            if cached:
-                logger.debug("Cache hit for issue #%s", issue.number)
-                return cached
+        results: List[Optional[str]] = []
+        for issue, key, summary in zip(group, keys, summaries):
+            if summary is None or _check_summary_quality(summary):
+                results.append(None)
+                continue
+            logger.debug("Successfully generated summary for issue #%s", issue.number)
+            fresh[key] = summary
+            generated.add(key)
+            results.append(summary)
+        return results
+
+    async def _summarize_single_issue(issue, cache_key: str) -> str:
+        """为单个 issue 生成摘要，相同 cache_key 的并发调用只发起一次请求"""
+        while True:
+            pending = _inflight.get(cache_key)
+            if pending is None:
+                break
+            try:
+                # shield：某个等待者被取消时不影响其他共享结果的调用方
+                return await asyncio.shield(pending)
+            except _InflightCancelled:
+                # 发起请求的调用方被取消，由仍在等待的调用方重新发起
+                continue
+        future = asyncio.get_running_loop().create_future()
+        _inflight[cache_key] = future
+        try:
+            summary = await _request_single_summary(issue, cache_key)
+        except asyncio.CancelledError:
+            # 不能直接 cancel future：那会把 CancelledError 传给并未被取消的等待者
+            future.set_exception(_InflightCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 标记异常已读取，没有等待者时不再告警
+            raise
+        else:
+            future.set_result(summary)
+            return summary
+        finally:
+            if _inflight.get(cache_key) is future:
+                del _inflight[cache_key]
 
+    async def _request_single_summary(issue, cache_key: str) -> str:
+        """为单个 issue 请求摘要（带重试），全部失败时使用本地降级摘要"""
         async with semaphore:
-            prompt = SUMMARY_PROMPT.format(
+            prompt = _render_summary_prompt(
                 type_=issue.type_,
                 priority=issue.priority,
                 title=issue.title,
-                body=(issue.body or "")[:1500],
+                body=_truncate_body(issue.body),
             )
 
             # 重试机制
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    resp = await client.chat.completions.create(
-                        model=MODEL_NAME,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=40,
-                        temperature=0.3,
+                    content = await asyncio.wait_for(
+                        _stream_summary(
+                            model=MODEL_NAME,
+                            messages=[
+                                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                                {"role": "user", "content": prompt},
+                            ],
+                            max_tokens=40,
+                            temperature=0.3,
+                        ),
+                        timeout=STREAM_TIMEOUT,
                     )
-                    summary = (resp.choices[0].message.content or "").strip()
+                    summary = content.strip()
                     
                     # 质量检查
                     quality_error = _check_summary_quality(summary)
@@ -218,50 +552,49 @@ async def summarize_batch(
                     )
                     
                     # 缓存结果
-                    cache.set(cache_key, summary, expire_in=CACHE_EXPIRE)
+                    fresh[cache_key] = summary
+                    generated.add(cache_key)
                     return summary
 
-                except APITimeoutError:
+                except (APITimeoutError, asyncio.TimeoutError):
                     if attempt == max_retries - 1:
                         logger.error("API timeout for issue #%s after all retries", issue.number)
                         degradation_tracker.add(issue.number, "API 超时")
                         break
-                    wait = 2 ** attempt
-                    logger.warning("API timeout, retrying in %ds (attempt %d/%d)", wait, attempt + 1, max_retries)
+                    wait = _get_retry_delay("timeout", attempt)
+                    logger.warning("API timeout, retrying in %.1fs (attempt %d/%d)", wait, attempt + 1, max_retries)
                     await asyncio.sleep(wait)
                     
-                except RateLimitError:
+                except RateLimitError as e:
                     if attempt == max_retries - 1:
                         logger.error("Rate limit for issue #%s after all retries", issue.number)
                         degradation_tracker.add(issue.number, "API 速率限制")
                         break
-                    wait = 5 * (attempt + 1)
-                    logger.warning("Rate limit, retrying in %ds (attempt %d/%d)", wait, attempt + 1, max_retries)
+                    wait = _get_retry_delay("rate_limit", attempt, _retry_after(e))
+                    logger.warning("Rate limit, retrying in %.1fs (attempt %d/%d)", wait, attempt + 1, max_retries)
                     await asyncio.sleep(wait)
                     
-                except APIError as e:
-                    if attempt == max_retries - 1:
-                        logger.error("API error for issue #%s after all retries: %s", issue.number, e)
+                except (APIError, httpx.HTTPError) as e:
+                    if not _is_retryable(e):
+                        # 400/401/404 等请求本身的问题，重试只会浪费配额和时间
+                        logger.error("Non-retryable API error for issue #%s: %s", issue.number, e)
                         degradation_tracker.add(issue.number, f"API 错误：{e}")
                         break
-                    wait = 2 ** attempt
-                    logger.warning("API error, retrying in %ds (attempt %d/%d): %s", wait, attempt + 1, max_retries, e)
-                    await asyncio.sleep(wait)
-                    
-                except Exception as e:
                     if attempt == max_retries - 1:
-                        logger.error("Unexpected error for issue #%s after all retries: %s", issue.number, e)
-                        degradation_tracker.add(issue.number, f"未知错误：{e}")
+                        logger.error("API error for issue #%s after all retries: %s", issue.number, e)
+                        degradation_tracker.add(issue.number, f"API 错误：{e}")
                         break
-                    wait = 2 ** attempt
-                    logger.warning("Unexpected error, retrying in %ds (attempt %d/%d): %s", wait, attempt + 1, max_retries, e)
+                    wait = _get_retry_delay("default", attempt, _retry_after(e))
+                    logger.warning("API error, retrying in %.1fs (attempt %d/%d): %s", wait, attempt + 1, max_retries, e)
                     await asyncio.sleep(wait)
 
+                # 其余异常（TypeError、KeyError 等）是代码缺陷而非接口故障，不重试也不降级，直接抛出
+
             # 所有重试都失败，使用本地 fallback
             logger.info("Using local fallback for issue #%s", issue.number)
             raw_text = " ".join(filter(None, [issue.title, issue.body])).strip()
             summary = f"「{shorten(raw_text, 28, placeholder='…')}」"
-            cache.set(cache_key, summary, expire_in=CACHE_EXPIRE)
+            fresh[cache_key] = summary
             return summary
 
     with Progress(
@@ -272,11 +605,82 @@ async def summarize_batch(
     ) as progress:
         task = progress.add_task("正在生成摘要...", total=len(issues))
         try:
-            results = []
-            for issue in issues:
-                summary = await _summarize_single_issue(issue)
-                results.append(summary)
-                progress.update(task, advance=1)
+            keys = [_get_cache_key(issue) for issue in issues]
+            results: List[Optional[str]] = [None] * len(issues)
+
+            # 先批量查缓存，命中的 issue 不参与后续请求
+            if not force_refresh:
+                cached = cache.get_many(keys)
+                for idx, (issue, key) in enumerate(zip(issues, keys)):
+                    if cached.get(key):
+                        logger.debug("Cache hit for issue #%s", issue.number)
+                        results[idx] = cached[key]
+                        progress.update(task, advance=1)
+
+            # 同一批内缓存键相同的 issue 只处理一次，结果再写回所有位置
+            by_key: Dict[str, List[int]] = {}
+            for idx, summary in enumerate(results):
+                if summary is None:
+                    by_key.setdefault(keys[idx], []).append(idx)
+
+            def _done(idx: int, summary: str) -> None:
+                """写回 idx 及其重复项的结果，并推进进度条"""
+                same = by_key[keys[idx]]
+                for i in same:
+                    results[i] = summary
+                progress.update(task, advance=len(same))
+
+            async def _fill(idx: int, summary: Optional[str]) -> None:
+                """批量结果缺失时单独请求，写回结果"""
+                if summary is None:
+                    summary = await _summarize_single_issue(issues[idx], keys[idx])
+                _done(idx, summary)
+
+            async def _process_chunk(chunk: List[int]) -> None:
+                if len(chunk) > 1:
+                    summaries = await _summarize_group(
+                        [issues[i] for i in chunk], [keys[i] for i in chunk]
+                    )
+                else:
+                    summaries = [None]
+                await asyncio.gather(
+                    *(_fill(idx, summary) for idx, summary in zip(chunk, summaries))
+                )
+
+            todo = [same[0] for same in by_key.values()]
+
+            # 原文已足够短的 issue 直接作为摘要，不再计算嵌入或请求大模型
+            for idx in todo:
+                direct = _direct_summary(issues[idx])
+                if direct:
+                    logger.debug("Using original text as summary for issue #%s", issues[idx].number)
+                    metrics["direct_hits"] += 1
+                    fresh[keys[idx]] = direct
+                    _done(idx, direct)
+            todo = [idx for idx in todo if results[idx] is None]
+
+            # 语义缓存：为未命中的 issue 一次性计算嵌入，与已有摘要足够相似的直接复用
+            if semantic_cache is not None and todo:
+                embeddings = await _embed_issues([issues[i] for i in todo])
+                if embeddings is not None:
+                    vectors = {keys[i]: vec for i, vec in zip(todo, embeddings)}
+                if vectors and not force_refresh:
+                    hits = semantic_cache.lookup_many([vectors[keys[idx]] for idx in todo])
+                    for idx, hit in zip(todo, hits):
+                        if hit:
+                            fresh[keys[idx]] = hit
+                            _done(idx, hit)
+                    todo = [idx for idx in todo if results[idx] is None]
+
+            # 未命中的 issue 每 BATCH_N 个合并为一次请求，失败的再逐个请求；
+            # 各组并发执行但同时存活的任务数有上限，实际在途请求数由信号量限制
+            await _run_bounded(
+                (
+                    _process_chunk(todo[start:start + BATCH_N])
+                    for start in range(0, len(todo), BATCH_N)
+                ),
+                concurrency_limit,
+            )
                 
             # 输出降级统计
             degradation_summary = degradation_tracker.get_summary()
@@ -288,6 +692,16 @@ async def summarize_batch(
         except Exception as e:
             logger.error("Batch processing failed: %s", e)
             raise LLMSummaryError("Failed to process issue batch") from e
+        finally:
+            # 即使中途失败，已生成的摘要也会写入缓存；落盘由后台写回任务在线程池中完成，不阻塞事件循环
+            for key, summary in fresh.items():
+                cache.set_async(key, summary, expire_in=CACHE_EXPIRE)
+            if semantic_cache is not None:
+                semantic_cache.add_many([
+                    (key, vec, fresh[key])
+                    for key, vec in vectors.items()
+                    if key in generated
+                ])
 
 
 async def summarize_single(
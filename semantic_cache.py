@@ -0,0 +1,166 @@
+"""基于向量相似度的语义缓存：内容相近的 issue 复用已有摘要"""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from cache import SQLITE_BUSY_TIMEOUT_MS, setup_logger
+
+logger = setup_logger(__name__)
+
+# 查询时每次反量化的行数，限制临时 float32 矩阵的大小
+DEQUANT_BLOCK_ROWS = 4096
+
+
+class SemanticCache:
+    """
+    语义缓存
+
+    特性：
+    - 向量在写入时 L2 归一化，查询时余弦相似度退化为一次矩阵乘法
+    - 向量按行对称量化为 int8（每行一个 float32 缩放系数），常驻内存的矩阵只有 float32 的 1/4，
+      余弦相似度的量化误差约在 1e-3 量级，远小于命中阈值的粒度
+    - SQLite 只负责持久化
+    - 按 namespace 隔离：嵌入模型、摘要模型或提示词变化后不会命中旧数据
+    """
+
+    def __init__(self, db_path: str, namespace: str, threshold: float = 0.92):
+        self._namespace = namespace
+        self._threshold = threshold
+        self._lock = threading.Lock()
+
+        path = Path(db_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        # 旧版本以 float32 存储向量且没有 scale 列；缓存可再生，直接重建表即可
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if columns and "scale" not in columns:
+            logger.info("Dropping semantic cache table with outdated schema")
+            self._conn.execute("DROP TABLE embeddings")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                vec BLOB NOT NULL,
+                scale REAL NOT NULL,
+                value TEXT NOT NULL
+            )
+        """)
+
+        # 启动时一次性载入当前 namespace 的全部向量
+        rows = self._conn.execute(
+            "SELECT key, vec, scale, value FROM embeddings WHERE namespace = ?",
+            (namespace,),
+        ).fetchall()
+        self._keys: list[str] = [row[0] for row in rows]
+        self._index: dict[str, int] = {key: i for i, key in enumerate(self._keys)}
+        self._values: list[str] = [row[3] for row in rows]
+        self._matrix: Optional[np.ndarray] = (
+            np.vstack([np.frombuffer(row[1], dtype=np.int8) for row in rows])
+            if rows
+            else None
+        )
+        self._scales = np.array([row[2] for row in rows], dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        """转换为 float32 并做 L2 归一化"""
+        v = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    @staticmethod
+    def _quantize(v: np.ndarray) -> tuple[np.ndarray, float]:
+        """对称量化为 int8，返回 (量化向量, 缩放系数)，满足 v ≈ q * scale"""
+        peak = float(np.max(np.abs(v))) if v.size else 0.0
+        if not peak:
+            return np.zeros(v.shape, dtype=np.int8), 0.0
+        scale = peak / 127
+        return np.round(v / scale).astype(np.int8), scale
+
+    def lookup(self, vec) -> Optional[str]:
+        """返回与 vec 余弦相似度最高且不低于阈值的缓存值，没有则返回 None"""
+        return self.lookup_many([vec])[0]
+
+    def lookup_many(self, vecs) -> list[Optional[str]]:
+        """
+        批量查询：所有查询向量组成矩阵 Q，按块反量化后与 M.T 相乘得到全部相似度
+
+        查询向量保持 float32，只有缓存向量带量化误差；分块反量化使临时内存与缓存规模无关
+        """
+        if self._matrix is None or not len(vecs):
+            return [None] * len(vecs)
+        queries = np.array(vecs, dtype=np.float32)  # 复制一份，归一化不改动调用方的数组
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+        sims = np.empty((len(queries), len(self._matrix)), dtype=np.float32)
+        for start in range(0, len(self._matrix), DEQUANT_BLOCK_ROWS):
+            end = start + DEQUANT_BLOCK_ROWS
+            block = self._matrix[start:end].astype(np.float32)
+            sims[:, start:end] = (queries @ block.T) * self._scales[start:end]
+        best = sims.argmax(axis=1)
+        best_sims = sims[np.arange(len(queries)), best]
+        results: list[Optional[str]] = []
+        for idx, sim in zip(best.tolist(), best_sims.tolist()):
+            if sim < self._threshold:
+                results.append(None)
+                continue
+            logger.debug("Semantic cache hit: %s (similarity %.3f)", self._keys[idx], sim)
+            results.append(self._values[idx])
+        return results
+
+    def add_many(self, items: list[tuple[str, object, str]]) -> None:
+        """批量写入 (key, 向量, 缓存值)，在单个事务内落盘"""
+        if not items:
+            return
+        # 同一批次内重复的 key 以最后一次为准
+        rows = {
+            key: (*self._quantize(self._normalize(vec)), value)
+            for key, vec, value in items
+        }
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, namespace, vec, scale, value) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (key, self._namespace, q.tobytes(), scale, value)
+                        for key, (q, scale, value) in rows.items()
+                    ],
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+            new_vecs, new_scales = [], []
+            for key, (q, scale, value) in rows.items():
+                idx = self._index.get(key)
+                if idx is not None:
+                    self._matrix[idx] = q
+                    self._scales[idx] = scale
+                    self._values[idx] = value
+                    continue
+                self._index[key] = len(self._keys)
+                self._keys.append(key)
+                self._values.append(value)
+                new_vecs.append(q)
+                new_scales.append(scale)
+            if new_vecs:
+                stacked = np.vstack(new_vecs)
+                self._matrix = (
+                    stacked if self._matrix is None else np.vstack([self._matrix, stacked])
+                )
+                self._scales = np.concatenate(
+                    [self._scales, np.asarray(new_scales, dtype=np.float32)]
+                )
@@ -1,10 +1,13 @@
 """测试缓存系统"""
+import asyncio
+import sqlite3
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 
-from cache import Cache
+from cache import Cache, RedisTier, _EXPIRE_HEADER, _encode
 
 
 @pytest.fixture
@@ -19,10 +22,10 @@ def test_basic_operations(temp_cache):
     # 设置缓存
     temp_cache.set("test_key", "test_value")
     assert temp_cache.get("test_key") == "test_value"
-    
+
     # 获取不存在的键
     assert temp_cache.get("non_existent") is None
-    
+
     # 删除缓存
     temp_cache.delete("test_key")
     assert temp_cache.get("test_key") is None
@@ -33,7 +36,7 @@ def test_expiration(temp_cache):
     # 设置 1 秒过期的缓存
     temp_cache.set("short_lived", "value", expire_in=1)
     assert temp_cache.get("short_lived") == "value"
-    
+
     # 等待过期
     time.sleep(1.1)
     assert temp_cache.get("short_lived") is None
@@ -76,15 +79,15 @@ def test_clear(temp_cache):
     temp_cache.set("a", 1)
     temp_cache.set("b", 2)
     temp_cache.set("c", 3)
-    
+
     # 清空缓存
     temp_cache.clear()
-    
+
     # 验证所有项都被删除
     assert temp_cache.get("a") is None
     assert temp_cache.get("b") is None
     assert temp_cache.get("c") is None
-    
+
     # 验证内存缓存也被清空
     assert len(temp_cache._memory_cache) == 0
 
@@ -92,11 +95,258 @@ def test_clear(temp_cache):
 def test_persistence(tmp_path):
     """测试缓存持久化"""
     db_path = tmp_path / "persist_test.db"
-    
+
     # 第一个缓存实例
     cache1 = Cache(str(db_path))
     cache1.set("persist", "value")
-    
+
     # 创建新的缓存实例，应该能读取到之前的值
     cache2 = Cache(str(db_path))
-    assert cache2.get("persist") == "value" 
\ No newline at end of file
+    assert cache2.get("persist") == "value"
+
+
+def test_pending_writes(tmp_path):
+    """测试写缓冲：攒满前不落盘，攒满或 flush 后其他实例可读到"""
+    db_path = tmp_path / "pending_test.db"
+    cache = Cache(str(db_path), pending_limit=3)
+    other = Cache(str(db_path))
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    assert other.get("b") is None
+
+    # 攒满 3 条后自动批量落盘
+    cache.set("c", 3)
+    assert [other.get(k) for k in "abc"] == [1, 2, 3]
+
+    # 手动 flush 剩余数据
+    cache.set("d", 4)
+    cache.flush()
+    assert other.get("d") == 4
+
+
+def test_memory_lru(tmp_path):
+    """测试内存缓存按最近使用淘汰"""
+    cache = Cache(str(tmp_path / "lru_test.db"), max_memory_items=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # 访问 a 后，再写入 c 应淘汰 b
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert set(cache._memory_cache.keys()) == {"a", "c"}
+
+
+def test_legacy_schema(tmp_path):
+    """测试旧版 TEXT 表结构会被自动重建"""
+    db_path = tmp_path / "legacy_test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expire_time REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO cache VALUES ('old', '1', ?)", (time.time() + 60,))
+    conn.commit()
+    conn.close()
+
+    cache = Cache(str(db_path))
+    assert cache.get("old") is None
+    cache.set("new", {"a": 1})
+    assert Cache(str(db_path)).get("new") == {"a": 1}
+
+
+def test_track_keys(tmp_path):
+    """测试已知 key 集合：加载已有数据，并跟踪本实例的写入与删除"""
+    db_path = tmp_path / "track_test.db"
+    Cache(str(db_path)).set("old", 1)
+
+    cache = Cache(str(db_path), track_keys=True)
+    assert cache._known_keys == {"old"}
+    assert cache.get("old") == 1
+
+    cache.set("new", 2)
+    cache.delete("old")
+    assert cache._known_keys == {"new"}
+    assert cache.get("old") is None
+    assert cache.get("missing") is None
+
+
+def test_get_many(tmp_path):
+    """测试批量获取：合并内存与数据库命中，跳过过期和不存在的 key"""
+    db_path = tmp_path / "many_test.db"
+    Cache(str(db_path)).set("db", 1)
+
+    cache = Cache(str(db_path))
+    cache.set("mem", 2)
+    cache.set("expired", 3, expire_in=1)
+    time.sleep(1.1)
+    assert cache.get_many(["db", "mem", "expired", "missing"]) == {"db": 1, "mem": 2}
+    # 数据库命中会被提升到内存缓存
+    assert "db" in cache._memory_cache
+
+
+def test_set_many(tmp_path):
+    """测试批量写入：一次事务落盘，并同步到内存缓存"""
+    db_path = tmp_path / "set_many_test.db"
+    cache = Cache(str(db_path), track_keys=True)
+    cache.set_many([("a", 1), ("b", {"x": 2})], expire_in=60)
+
+    assert cache._pending == []
+    assert cache._known_keys == {"a", "b"}
+    assert Cache(str(db_path)).get_many(["a", "b"]) == {"a": 1, "b": {"x": 2}}
+
+
+def test_value_encoding(tmp_path):
+    """测试带格式标记的编码：字符串、JSON、msgpack 兜底，以及无标记的旧数据"""
+    db_path = tmp_path / "encoding_test.db"
+    cache = Cache(str(db_path))
+    cache.set("str", "「摘要」")
+    cache.set("json", {"a": [1, 2]})
+    cache.set("bytes", b"\x00raw")
+    cache._writer().execute(
+        "INSERT INTO cache VALUES ('legacy', ?, ?)", (b'"old"', time.time() + 60)
+    )
+
+    raw = cache._writer().execute("SELECT value FROM cache WHERE key = 'str'").fetchone()[0]
+    assert raw == b"\x01" + "「摘要」".encode()
+
+    reopened = Cache(str(db_path))
+    assert reopened.get("str") == "「摘要」"
+    assert reopened.get("json") == {"a": [1, 2]}
+    assert reopened.get("bytes") == b"\x00raw"
+    assert reopened.get("legacy") == "old"
+
+
+def test_memory_cache_threads(tmp_path):
+    """多线程并发读写内存缓存时 LRU 结构保持一致"""
+    cache = Cache(str(tmp_path / "threads_test.db"), max_memory_items=8)
+    for i in range(16):
+        cache.set(f"key{i}", i)
+
+    def worker(n):
+        for i in range(200):
+            key = f"key{(n + i) % 16}"
+            assert cache.get(key) == (n + i) % 16
+            cache.get_many([key, "missing"])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(worker, range(8)))
+    assert len(cache._memory_cache) <= 8
+
+
+class DictTier:
+    """测试用的共享缓存层"""
+    def __init__(self):
+        self.data = {}
+
+    def get_many(self, keys):
+        return {k: self.data[k] for k in keys if k in self.data}
+
+    def set_many(self, items):
+        for key, value, expire_time in items:
+            self.data[key] = (value, expire_time)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+
+def test_remote_tier(tmp_path):
+    """共享缓存层：写入所有层，读取时逐层查找并回填上层"""
+    db_path = tmp_path / "tier_test.db"
+    remote = DictTier()
+    cache = Cache(str(db_path), remote=remote)
+    cache.set("a", "值")
+    assert remote.data["a"][0] == "值"
+
+    # 其他实例写入共享层的数据，本实例即使 SQLite 中没有也能命中
+    remote.set_many([("b", {"x": 1}, time.time() + 60)])
+    other = Cache(str(tmp_path / "other.db"), track_keys=True, remote=remote)
+    assert other.get("b") == {"x": 1}
+    assert other.get_many(["a", "b", "c"]) == {"a": "值", "b": {"x": 1}}
+
+    # SQLite 命中的数据回填到共享层
+    remote.clear()
+    fresh = Cache(str(db_path), remote=remote)
+    assert fresh.get_many(["a"]) == {"a": "值"}
+    assert "a" in remote.data
+
+    fresh.delete("a")
+    assert "a" not in remote.data
+
+
+def test_set_async(tmp_path):
+    """set_async 立即写入内存，后台任务合并为一个事务落盘"""
+    db_path = tmp_path / "async_test.db"
+
+    async def main():
+        cache = Cache(str(db_path))
+        for i in range(20):
+            cache.set_async(f"key{i}", f"值{i}")
+        assert cache.get("key0") == "值0"
+        await cache.aflush()
+        assert cache._writer_task is None
+
+    asyncio.run(main())
+    assert Cache(str(db_path)).get_many([f"key{i}" for i in range(20)]) == {
+        f"key{i}": f"值{i}" for i in range(20)
+    }
+
+
+def test_set_async_clear_and_loop_change(tmp_path):
+    """clear 丢弃已入队的写入；事件循环变化时遗留的写入同步落盘而不是丢弃"""
+    db_path = tmp_path / "async_clear.db"
+    cache = Cache(str(db_path))
+
+    async def clear_before_write_back():
+        cache.set_async("cleared", 1)
+        cache.clear()
+        await cache.aflush()
+
+    asyncio.run(clear_before_write_back())
+    assert Cache(str(db_path)).get("cleared") is None
+
+    async def leave_queued():
+        cache.set_async("left", "遗留")
+
+    async def next_loop():
+        cache.set_async("next", "下一个")
+        await cache.aflush()
+
+    asyncio.run(leave_queued())
+    asyncio.run(next_loop())
+    assert Cache(str(db_path)).get_many(["left", "next"]) == {"left": "遗留", "next": "下一个"}
+
+
+def test_redis_tier_errors(monkeypatch):
+    """Redis 中损坏的值按未命中处理；访问出错后暂停访问 Redis"""
+    class Down(Exception):
+        pass
+
+    class FakeRedis:
+        def __init__(self):
+            self.calls = 0
+            self.down = False
+
+        def mget(self, keys):
+            self.calls += 1
+            if self.down:
+                raise Down("connection refused")
+            header = _EXPIRE_HEADER.pack(time.time() + 60)
+            return [b"abc", header + _encode("值"), header + b"\x02{bad"]
+
+    tier = RedisTier.__new__(RedisTier)
+    tier._client = FakeRedis()
+    tier._prefix = "test:"
+    tier._errors = (Down,)
+    tier._retry_at = 0.0
+    assert tier.get_many(["short", "good", "broken"]) == {
+        "good": ("值", pytest.approx(time.time() + 60, abs=5))
+    }
+
+    tier._client.down = True
+    assert tier.get_many(["good"]) == {}
+    assert tier.get_many(["good"]) == {}
+    assert tier._client.calls == 2
@@ -1,8 +1,11 @@
 """
 pytest 单元测试：过滤与分类逻辑
 """
+import asyncio
 from datetime import datetime
 import pytest  # noqa: F401  用于 pytest 自动发现用例
+import github_issue_summarizer
+from cache import Cache
 from github_issue_summarizer import should_include, classify_issue, Issue
 
 
@@ -53,3 +56,36 @@ def test_classify_priority():
     """带 priority/critical 标签时应推断为 P0"""
     issue = make_issue(labels=["priority/critical"])
     assert classify_issue(issue).priority == "P0"
+
+
+def test_classify_type_order():
+    """同时命中多个类型时，按 TYPE_PATTERNS 中的先后顺序取第一个"""
+    issue = make_issue(title="Add feature flag", body="also fix the crash")
+    assert classify_issue(issue).type_ == "Bug"
+
+
+def test_classify_cached(tmp_path, monkeypatch):
+    """updated_at 未变化时复用缓存的分类结果，不再重新匹配"""
+    monkeypatch.setattr(
+        github_issue_summarizer, "classify_cache", Cache(str(tmp_path / "cls.db"))
+    )
+    issue = make_issue(title="Bug in parser", labels=["priority/critical"])
+    github_issue_summarizer._classify_cached([issue], "o/r")
+    assert (issue.type_, issue.priority) == ("Bug", "P0")
+
+    calls = []
+    monkeypatch.setattr(github_issue_summarizer, "classify_issue", calls.append)
+    again = make_issue(title="Bug in parser", updated_at=issue.updated_at)
+    github_issue_summarizer._classify_cached([again], "o/r")
+    assert (again.type_, again.priority) == ("Bug", "P0")
+    assert calls == []
+
+
+def test_github_client_closed():
+    """运行结束时关闭共享的 GitHub 客户端并清空单例"""
+    async def main():
+        client = github_issue_summarizer._get_client()
+        await github_issue_summarizer._aclose_client()
+        assert client.is_closed
+        assert github_issue_summarizer._client is None
+    asyncio.run(main())
@@ -1,25 +1,72 @@
 import asyncio
 from datetime import datetime
+from types import SimpleNamespace
 from unittest.mock import patch
 import pytest
+import httpx
+from openai import APIConnectionError
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice, ChoiceDelta
 
 from llm_summary import summarize_batch, LLMQualityError
 from github_issue_summarizer import Issue
 
+
+def fake_client(chat=None, embed=None):
+    """替身客户端：只提供 chat.completions.create 与 embeddings.create"""
+    return SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=chat)),
+        embeddings=SimpleNamespace(create=embed),
+    )
+
+
 class DummyResp:
     class Choice:
         def __init__(self, content):
             self.message = type('msg', (), {'content': content})
+
     def __init__(self, content):
         self.choices = [self.Choice(content)]
 
+
+def make_chunk(text):
+    return ChatCompletionChunk(
+        id="chunk",
+        choices=[ChunkChoice(index=0, delta=ChoiceDelta(content=text), finish_reason=None)],
+        created=0,
+        model="test",
+        object="chat.completion.chunk",
+    )
+
+
+class DummyStream:
+    """流式响应替身：逐个产出 ChatCompletionChunk，记录已读取的片段与是否关闭"""
+    def __init__(self, *parts):
+        self.parts = parts
+        self.received = []
+        self.closed = False
+
+    async def __aiter__(self):
+        for text in self.parts:
+            self.received.append(text)
+            yield make_chunk(text)
+
+    async def close(self):
+        self.closed = True
+
+
+def reply(content, kw):
+    """按请求是否为流式返回对应的响应替身"""
+    return DummyStream(content) if kw.get("stream") else DummyResp(content)
+
+
 @pytest.mark.asyncio
 async def test_summarize_batch_cache(monkeypatch):
     # 模拟缓存命中
     issue = Issue(
         number=1,
         title="Bug: test cache",
-        body="body",
+        body="body text describing how to reproduce the problem",
         labels=[],
         assignees=[],
         state="open",
@@ -28,17 +75,21 @@ async def test_summarize_batch_cache(monkeypatch):
         html_url="",
     )
     # 强制缓存命中
-    with patch("llm_summary.cache.get", return_value="「缓存摘要」"):
+    with patch(
+        "llm_summary.cache.get_many",
+        side_effect=lambda keys: {k: "「缓存摘要」" for k in keys},
+    ):
         result = await summarize_batch([issue])
         assert result == ["「缓存摘要」"]
 
+
 @pytest.mark.asyncio
 async def test_summarize_batch_fallback(monkeypatch):
     # 模拟 LLM 失败，触发 fallback
     issue = Issue(
         number=2,
         title="Feature: fallback",
-        body="body",
+        body="body text describing how to reproduce the problem",
         labels=[],
         assignees=[],
         state="open",
@@ -46,21 +97,24 @@ async def test_summarize_batch_fallback(monkeypatch):
         updated_at=datetime.now(),
         html_url="",
     )
-    # LLM 总是抛异常
+    # LLM 总是连接失败
     async def raise_exc(*a, **kw):
-        raise Exception("fail")
-    with patch("llm_summary.cache.get", return_value=None), \
-         patch("llm_summary.client.chat.completions.create", raise_exc):
+        raise APIConnectionError(
+            request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        )
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(raise_exc)):
         result = await summarize_batch([issue])
         assert result[0].startswith("「Feature: fallback body")
 
+
 @pytest.mark.asyncio
 async def test_summarize_batch_quality(monkeypatch):
     # 模拟 LLM 返回不合格摘要，最终 fallback
     issue = Issue(
         number=3,
         title="Bug: quality",
-        body="body",
+        body="body text describing how to reproduce the problem",
         labels=[],
         assignees=[],
         state="open",
@@ -70,8 +124,402 @@ async def test_summarize_batch_quality(monkeypatch):
     )
     # LLM 总是返回不合格摘要
     async def bad_summary(*a, **kw):
-        return DummyResp("not valid")
-    with patch("llm_summary.cache.get", return_value=None), \
-         patch("llm_summary.client.chat.completions.create", bad_summary):
+        return reply("not valid", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(bad_summary)):
         result = await summarize_batch([issue], force_refresh=True)
-        assert result[0].startswith("「Bug: quality body") 
\ No newline at end of file
+        assert result[0].startswith("「Bug: quality body")
+
+
+def make_issues(count):
+    return [
+        Issue(
+            number=100 + i,
+            title=f"Bug: batch {i}",
+            body="body text describing how to reproduce the problem",
+            labels=[],
+            assignees=[],
+            state="open",
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            html_url="",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_grouped():
+    # 多个 issue 合并为一次请求，按 idx 对齐结果
+    issues = make_issues(3)
+    calls = []
+    async def batch_summary(*a, **kw):
+        calls.append(kw)
+        return DummyResp(
+            '{"summaries": [{"idx": 2, "summary": "「第三个问题摘要」"}, '
+            '{"idx": 0, "summary": "「第一个问题摘要」"}, '
+            '{"idx": 1, "summary": "「第二个问题摘要」"}]}'
+        )
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(batch_summary)):
+        result = await summarize_batch(issues, force_refresh=True)
+    assert result == ["「第一个问题摘要」", "「第二个问题摘要」", "「第三个问题摘要」"]
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_grouped_mismatch():
+    # 批量响应数量不符时，逐个降级请求
+    issues = make_issues(2)
+    async def summary(*a, **kw):
+        if "response_format" in kw:
+            return DummyResp('{"summaries": [{"idx": 0, "summary": "「只有一个摘要」"}]}')
+        return reply("「单独生成的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(summary)):
+        result = await summarize_batch(issues, force_refresh=True)
+    assert result == ["「单独生成的摘要」", "「单独生成的摘要」"]
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_groups_concurrent():
+    # 多个分组应并发请求，而不是逐组等待
+    issues = make_issues(30)
+    in_flight = peak = 0
+    async def slow_summary(*a, **kw):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return reply("「并发生成的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(slow_summary)):
+        result = await summarize_batch(issues, force_refresh=True)
+    assert result == ["「并发生成的摘要」"] * 30
+    assert peak > 1
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_semantic_hit(tmp_path, monkeypatch):
+    # 语义缓存命中时不再调用大模型
+    import llm_summary
+    from semantic_cache import SemanticCache
+    semantic = SemanticCache(str(tmp_path / "sem.db"), namespace="ns")
+    semantic.add_many([("other", [1.0, 0.0], "「相似问题的摘要」")])
+    monkeypatch.setattr(llm_summary, "semantic_cache", semantic)
+
+    class EmbeddingResp:
+        data = [type("item", (), {"embedding": [0.99, 0.01]})]
+    async def embed(*a, **kw):
+        return EmbeddingResp()
+    async def chat(*a, **kw):
+        raise AssertionError("LLM should not be called")
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(chat, embed)):
+        result = await summarize_batch(make_issues(1))
+    assert result == ["「相似问题的摘要」"]
+    # 命中的摘要不会再作为新向量写回
+    assert len(semantic) == 1
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_semantic_add_generated(tmp_path, monkeypatch):
+    # 只有大模型新生成的摘要写入语义缓存
+    import llm_summary
+    from semantic_cache import SemanticCache
+    semantic = SemanticCache(str(tmp_path / "sem.db"), namespace="ns")
+    monkeypatch.setattr(llm_summary, "semantic_cache", semantic)
+
+    class EmbeddingResp:
+        data = [type("item", (), {"embedding": [1.0, 0.0]})]
+    async def embed(*a, **kw):
+        return EmbeddingResp()
+    async def chat(*a, **kw):
+        return reply("「新生成的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(chat, embed)):
+        assert await summarize_batch(make_issues(1)) == ["「新生成的摘要」"]
+    assert semantic.lookup([1.0, 0.0]) == "「新生成的摘要」"
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_embedding_errors(tmp_path, monkeypatch):
+    # 嵌入接口故障时跳过语义缓存；代码缺陷直接抛出
+    import llm_summary
+    from llm_summary import LLMSummaryError
+    from semantic_cache import SemanticCache
+    semantic = SemanticCache(str(tmp_path / "sem.db"), namespace="ns")
+    monkeypatch.setattr(llm_summary, "semantic_cache", semantic)
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    async def embed_down(*a, **kw):
+        raise APIConnectionError(request=request)
+    async def chat(*a, **kw):
+        return reply("「跳过语义缓存的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(chat, embed_down)):
+        assert await summarize_batch(make_issues(1)) == ["「跳过语义缓存的摘要」"]
+
+    async def embed_bug(*a, **kw):
+        raise TypeError("bug")
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(chat, embed_bug)):
+        with pytest.raises(LLMSummaryError):
+            await summarize_batch(make_issues(1))
+
+
+def test_retry_delay_jitter():
+    # 退避时间落在 [0, min(上限, 基数 * 2^attempt)] 内，Retry-After 优先
+    from llm_summary import _get_retry_delay, _retry_after
+    delays = [_get_retry_delay("timeout", 2) for _ in range(200)]
+    assert all(0 <= d <= 0.8 for d in delays)
+    assert len(set(delays)) > 1
+    assert all(_get_retry_delay("rate_limit", 10) <= 60 for _ in range(50))
+    assert _get_retry_delay("rate_limit", 0, retry_after=7) == 7
+
+    error = Exception()
+    error.response = type("resp", (), {"headers": {"retry-after": "3"}})
+    assert _retry_after(error) == 3.0
+    assert _retry_after(Exception()) is None
+
+
+@pytest.mark.asyncio
+async def test_summarize_single_inflight_coalesced():
+    # 相同 issue 的并发单条请求只调用一次大模型
+    issue = make_issues(1)[0]
+    calls = []
+    async def slow_summary(*a, **kw):
+        calls.append(kw)
+        await asyncio.sleep(0.05)
+        return reply("「合并请求的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(slow_summary)):
+        results = await asyncio.gather(
+            summarize_batch([issue], force_refresh=True),
+            summarize_batch([issue], force_refresh=True),
+        )
+    assert results == [["「合并请求的摘要」"], ["「合并请求的摘要」"]]
+    assert len(calls) == 1
+
+
+def test_compile_prompt_matches_format():
+    # 预解析的模板与 str.format 输出一致（包括转义的花括号）
+    from config import BATCH_SUMMARY_PROMPT, SUMMARY_PROMPT
+    from llm_summary import _compile_prompt
+    values = {"type_": "Bug", "priority": "P1", "title": "标题", "body": "正文"}
+    assert _compile_prompt(SUMMARY_PROMPT)(**values) == SUMMARY_PROMPT.format(**values)
+    assert _compile_prompt(BATCH_SUMMARY_PROMPT)(count=2, issues="[]") == \
+        BATCH_SUMMARY_PROMPT.format(count=2, issues="[]")
+
+
+def test_check_summary_quality():
+    # 长度、格式与引号配对检查
+    from llm_summary import _check_summary_quality
+    assert _check_summary_quality("「添加深色主题支持」") is None
+    assert _check_summary_quality("『添加深色主题支持』") is None
+    assert _check_summary_quality("「添加深色主题支持』") == "摘要引号不匹配"
+    assert _check_summary_quality("「短」") is not None
+    assert _check_summary_quality("「" + "长" * 31 + "」") is not None
+    assert _check_summary_quality("「中间」多了引号」") is not None
+    assert _check_summary_quality("") == "摘要为空"
+
+
+@pytest.mark.asyncio
+async def test_summarize_single_stream_stops_at_closing_quote():
+    # 流式响应读到闭合引号即停止，并关闭流
+    stream = DummyStream("「流式", "生成的摘要」", "多余的输出")
+    async def stream_summary(*a, **kw):
+        assert kw["stream"] is True
+        return stream
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(stream_summary)):
+        result = await summarize_batch(make_issues(1), force_refresh=True)
+    assert result == ["「流式生成的摘要」"]
+    assert stream.received == ["「流式", "生成的摘要」"]
+    assert stream.closed
+
+
+@pytest.mark.asyncio
+async def test_summarize_single_stream_trims_after_closing_quote():
+    # 闭合引号与后续标点在同一片段时，只保留到引号为止
+    calls = []
+    async def stream_summary(*a, **kw):
+        calls.append(kw)
+        return DummyStream("「修复登录问题」。")
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(stream_summary)):
+        result = await summarize_batch(make_issues(1), force_refresh=True)
+    assert result == ["「修复登录问题」"]
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_dedup_same_key():
+    # 同一批内缓存键相同的 issue 只请求一次，结果写回所有位置
+    issue = make_issues(1)[0]
+    calls = []
+    async def summary(*a, **kw):
+        calls.append(kw)
+        return reply("「重复问题的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(summary)):
+        result = await summarize_batch([issue, issue], force_refresh=True)
+    assert result == ["「重复问题的摘要」"] * 2
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_summarize_batch_direct_short_issue():
+    # 原文足够短时直接作为摘要，不调用大模型
+    import llm_summary
+    issue = make_issues(1)[0]
+    issue.body = "body"
+    async def chat(*a, **kw):
+        raise AssertionError("LLM should not be called")
+    before = llm_summary.metrics["direct_hits"]
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(chat)):
+        result = await summarize_batch([issue], force_refresh=True)
+    assert result == ["「Bug: batch 0 body」"]
+    assert llm_summary.metrics["direct_hits"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_run_bounded():
+    # 同时存活的任务不超过上限；任一任务失败时取消其余任务
+    from llm_summary import _run_bounded
+    running = peak = 0
+    async def job():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+    await _run_bounded((job() for _ in range(10)), 3)
+    assert peak == 3
+
+    cancelled = []
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+    async def fail():
+        raise KeyError("bug")
+    with pytest.raises(KeyError):
+        await _run_bounded(iter([slow(), fail(), slow()]), 5)
+    assert cancelled == [True, True]
+
+    # 达到上限时失败：不会再从生成器取出协程，生成器也会被关闭
+    created, closed = [], []
+    def jobs():
+        try:
+            created.append("fail")
+            yield fail()
+            created.append("slow")
+            yield slow()
+        finally:
+            closed.append(True)
+    with pytest.raises(KeyError):
+        await _run_bounded(jobs(), 1)
+    assert created == ["fail"]
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_summarize_single_no_retry_on_bug_or_bad_request():
+    # 400 类错误不重试，直接降级；代码缺陷不重试也不降级，直接抛出
+    from openai import BadRequestError
+    from llm_summary import LLMSummaryError
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    bad_request = BadRequestError(
+        "bad request", response=httpx.Response(400, request=request), body=None
+    )
+    calls = []
+    async def fail(*a, **kw):
+        calls.append(kw)
+        raise bad_request
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(fail)):
+        result = await summarize_batch(make_issues(1), force_refresh=True)
+    assert result[0].startswith("「Bug: batch 0")
+    assert len(calls) == 1
+
+    calls.clear()
+    async def bug(*a, **kw):
+        calls.append(kw)
+        raise AttributeError("bug")
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(bug)):
+        with pytest.raises(LLMSummaryError) as excinfo:
+            await summarize_batch(make_issues(1), force_refresh=True)
+    assert isinstance(excinfo.value.__cause__, AttributeError)
+    assert len(calls) == 1
+
+
+def test_is_retryable():
+    from llm_summary import _is_retryable
+    request = httpx.Request("GET", "https://example.com")
+    def status_error(code):
+        return httpx.HTTPStatusError(
+            "error", request=request, response=httpx.Response(code, request=request)
+        )
+    assert _is_retryable(httpx.ConnectError("down"))
+    assert _is_retryable(status_error(503))
+    assert _is_retryable(status_error(429))
+    assert not _is_retryable(status_error(400))
+
+
+@pytest.mark.asyncio
+async def test_summarize_messages_share_static_prefix():
+    # 固定指令放在 system 消息中，各请求只有 user 消息不同
+    from config import SUMMARY_SYSTEM_PROMPT
+    calls = []
+    async def summary(*a, **kw):
+        calls.append(kw["messages"])
+        return reply("「分开发送的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary.BATCH_N", 1), \
+         patch("llm_summary._get_client", return_value=fake_client(summary)):
+        await summarize_batch(make_issues(2), force_refresh=True)
+    assert [m[0] for m in calls] == [{"role": "system", "content": SUMMARY_SYSTEM_PROMPT}] * 2
+    assert calls[0][1]["role"] == "user" and calls[0][1] != calls[1][1]
+
+
+def test_client_rebuilt_after_close():
+    # aclose 之后以及新的事件循环中都会重建客户端，而不是复用已关闭的连接池
+    import llm_summary
+    async def run_once():
+        client = llm_summary._get_client()
+        assert llm_summary._get_client() is client
+        await llm_summary.aclose()
+        assert client.is_closed()
+        rebuilt = llm_summary._get_client()
+        assert rebuilt is not client and not rebuilt.is_closed()
+        await llm_summary.aclose()
+        return rebuilt
+    first = asyncio.run(run_once())
+    second = asyncio.run(run_once())
+    assert first is not second
+
+
+@pytest.mark.asyncio
+async def test_summarize_single_inflight_owner_cancelled():
+    # 发起共享请求的调用被取消时，其他等待者不被连带取消，而是自行重新请求
+    issue = make_issues(1)[0]
+    calls = []
+    async def slow_summary(*a, **kw):
+        calls.append(kw)
+        await asyncio.sleep(0.05)
+        return reply("「重新请求的摘要」", kw)
+    with patch("llm_summary.cache.get_many", return_value={}), \
+         patch("llm_summary._get_client", return_value=fake_client(slow_summary)):
+        owner = asyncio.create_task(summarize_batch([issue], force_refresh=True))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(summarize_batch([issue], force_refresh=True))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        assert await waiter == ["「重新请求的摘要」"]
+    assert owner.cancelled()
+    assert len(calls) == 2
@@ -0,0 +1,82 @@
+"""
+pytest 单元测试：语义缓存
+"""
+from semantic_cache import SemanticCache
+
+
+def test_lookup_threshold(tmp_path):
+    """相似度达到阈值时命中，否则返回 None"""
+    cache = SemanticCache(str(tmp_path / "sem.db"), namespace="ns", threshold=0.9)
+    assert cache.lookup([1.0, 0.0]) is None
+
+    cache.add_many([("a", [1.0, 0.0], "「摘要 A」")])
+    # 长度不同但方向一致，余弦相似度为 1
+    assert cache.lookup([3.0, 0.1]) == "「摘要 A」"
+    assert cache.lookup([0.0, 1.0]) is None
+
+
+def test_persist_and_namespace(tmp_path):
+    """重新打开后按 namespace 载入数据，并可原地更新已有 key"""
+    db_path = str(tmp_path / "sem.db")
+    cache = SemanticCache(db_path, namespace="ns")
+    cache.add_many([("a", [1.0, 0.0], "「旧摘要」"), ("b", [0.0, 1.0], "「摘要 B」")])
+    cache.add_many([("a", [1.0, 0.0], "「新摘要」")])
+    assert len(cache) == 2
+
+    reopened = SemanticCache(db_path, namespace="ns")
+    assert reopened.lookup([1.0, 0.0]) == "「新摘要」"
+    assert reopened.lookup([0.0, 1.0]) == "「摘要 B」"
+    assert len(SemanticCache(db_path, namespace="other")) == 0
+
+
+def test_lookup_many(tmp_path):
+    """批量查询与逐个查询结果一致"""
+    cache = SemanticCache(str(tmp_path / "sem.db"), namespace="ns", threshold=0.9)
+    assert cache.lookup_many([[1.0, 0.0]]) == [None]
+
+    cache.add_many([("a", [1.0, 0.0], "「摘要 A」"), ("b", [0.0, 1.0], "「摘要 B」")])
+    queries = [[0.0, 2.0], [1.0, 1.0], [5.0, 0.2], [0.0, 0.0]]
+    assert cache.lookup_many(queries) == ["「摘要 B」", None, "「摘要 A」", None]
+    assert cache.lookup_many(queries) == [cache.lookup(q) for q in queries]
+
+
+def test_int8_quantization(tmp_path):
+    """int8 量化后的相似度与 float32 结果误差很小，旧的 float32 表会被重建"""
+    import sqlite3
+
+    import numpy as np
+
+    db_path = str(tmp_path / "sem.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE embeddings (key TEXT PRIMARY KEY, namespace TEXT NOT NULL, "
+        "vec BLOB NOT NULL, value TEXT NOT NULL)"
+    )
+    conn.commit()
+    conn.close()
+
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((50, 256)).astype(np.float32)
+    cache = SemanticCache(db_path, namespace="ns", threshold=0.0)
+    cache.add_many([(str(i), v, f"「摘要 {i}」") for i, v in enumerate(vecs)])
+    assert cache._matrix.dtype == np.int8
+
+    queries = vecs + 0.1 * rng.standard_normal(vecs.shape).astype(np.float32)
+    assert cache.lookup_many(queries) == [f"「摘要 {i}」" for i in range(50)]
+
+    # 量化误差：与精确余弦相似度相比
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    dequant = cache._matrix.astype(np.float32) * cache._scales[:, None]
+    assert np.abs(dequant @ unit[0] - unit @ unit[0]).max() < 0.01
+    assert len(SemanticCache(db_path, namespace="ns")) == 50
+
+
+def test_lookup_many_keeps_input(tmp_path):
+    """查询不会原地修改调用方传入的数组"""
+    import numpy as np
+
+    cache = SemanticCache(str(tmp_path / "sem.db"), namespace="ns")
+    cache.add_many([("a", [3.0, 4.0], "「摘要 A」")])
+    queries = np.array([[3.0, 4.0]], dtype=np.float32)
+    assert cache.lookup_many(queries) == ["「摘要 A」"]
+    assert queries.tolist() == [[3.0, 4.0]]
@@ -1,22 +1,37 @@
 """
 日志、限速、缓存等工具
 """
+import functools
 import logging
 import os
 from pathlib import Path
 from typing import Any, Optional
 
-from cache import Cache
+from cache import CACHE_DB_PATH, Cache
 
 # ------------- 日志等级 -------------
-env_file = Path(".env")
-LOG_LEVEL = "INFO"
-if env_file.is_file():
-    for line in env_file.read_text(encoding="utf-8").splitlines():
-        if line.startswith("LOG_LEVEL="):
-            _, level = line.split("=", 1)
-            LOG_LEVEL = level.strip()
-            break
+ENV_FILE = Path(".env")
+
+
+@functools.cache
+def _read_env_file() -> dict[str, str]:
+    """解析 .env 为字典（只在首次调用时读取磁盘），文件不存在时返回空字典"""
+    values: dict[str, str] = {}
+    try:
+        with ENV_FILE.open("rb") as f:
+            for line in f:
+                key, sep, value = line.partition(b"=")
+                if sep:
+                    values.setdefault(key.strip().decode(), value.strip().decode())
+    except FileNotFoundError:
+        pass
+    return values
+
+
+@functools.cache
+def _log_level() -> str:
+    """日志等级：优先取环境变量 LOG_LEVEL，其次是 .env，默认 INFO"""
+    return os.environ.get("LOG_LEVEL") or _read_env_file().get("LOG_LEVEL", "INFO")
 
 # ------------- logger -------------
 def setup_logger(name: str = "summarizer") -> logging.Logger:
@@ -25,7 +40,7 @@ def setup_logger(name: str = "summarizer") -> logging.Logger:
     if logger.hasHandlers():
         return logger
 
-    logger.setLevel(logging.getLevelName(LOG_LEVEL))
+    logger.setLevel(logging.getLevelName(_log_level()))
     handler = logging.StreamHandler()
     fmt = "[%(asctime)s] %(levelname)s - %(message)s"
     handler.setFormatter(logging.Formatter(fmt, datefmt="%H:%M:%S"))
@@ -34,9 +49,10 @@ def setup_logger(name: str = "summarizer") -> logging.Logger:
 
 # ------------- 缓存实例 -------------
 _cache = Cache(
-    db_path=os.getenv("CACHE_DB_PATH", ".cache/cache.db"),
+    db_path=CACHE_DB_PATH,
     max_memory_items=int(os.getenv("CACHE_MAX_MEMORY_ITEMS", "1000")),
     cleanup_interval=int(os.getenv("CACHE_CLEANUP_INTERVAL", "3600")),
+    pending_limit=int(os.getenv("CACHE_PENDING_LIMIT", "1")),
 )
 
 def get_cache(key: str) -> Any | None: